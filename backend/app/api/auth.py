@@ -1,5 +1,5 @@
-import bcrypt, secrets
-from datetime import datetime, timedelta
+import hmac
+import os
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel, EmailStr, Field
@@ -7,9 +7,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.database import SessionLocal
 from app.models import User
+from app.valuation import valuation_engine
+from app.leaderboard import leaderboard
+from app.money import to_cents, format_cents
+from app.token_store import token_store, TokenInvalid
+from app.principal_cache import Principal, principal_cache
+from app.passwords import password_hasher, PasswordHasherBusy
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Shared secret for operational endpoints (cache stats); unset disables them
+OPS_TOKEN = os.getenv("OPS_TOKEN")
+
 # ----------------------------
 # Schemas
 # ----------------------------
@@ -29,27 +38,22 @@ class TokenOut(BaseModel):
     token_type: str = "x-header"
     user_id: int
 
+class MeOut(BaseModel):
+    user_id: int
+    email: str
+    balance: str
+
 # ----------------------------
-# Token store
+# Tokens (backend chosen by TOKEN_STORE, see app.token_store)
 # ----------------------------
-SESSION_TOKENS = {}
-TOKEN_LIFETIME = timedelta(days=7)
-
-def make_token(user_id: int) -> str:
-    token = secrets.token_hex(32)
-    expires_at = datetime.utcnow() + TOKEN_LIFETIME
-    SESSION_TOKENS[token] = (user_id, expires_at)
-    return token
-
-def validate_token(token: str) -> int:
-    data = SESSION_TOKENS.get(token)
-    if not data:
-        raise HTTPException(401, detail="Invalid or expired token")
-    user_id, expires_at = data
-    if datetime.utcnow() > expires_at:
-        del SESSION_TOKENS[token]
-        raise HTTPException(401, detail="Session expired")
-    return user_id
+async def make_token(user_id: int) -> str:
+    return await token_store.issue(user_id)
+
+async def validate_token(token: str) -> int:
+    try:
+        return await token_store.resolve(token)
+    except TokenInvalid as exc:
+        raise HTTPException(401, detail=str(exc))
 
 # ----------------------------
 # DB dependency
@@ -61,14 +65,28 @@ async def get_db():
 # ----------------------------
 # Auth helpers
 # ----------------------------
-async def create_user(email: str, password_hash: str, balance: float, db: AsyncSession):
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(503, detail="Too many sign-ins in progress, retry shortly", headers={"Retry-After": "1"})
+
+async def check_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.check(password, hashed)
+    except PasswordHasherBusy:
+        raise HTTPException(503, detail="Too many sign-ins in progress, retry shortly", headers={"Retry-After": "1"})
+
+async def create_user(email: str, password_hash: str, balance_cents: int, db: AsyncSession):
     result = await db.execute(select(User).where(User.email == email))
     if result.scalar_one_or_none():
         raise HTTPException(400, detail="Email already registered")
-    user = User(email=email, password=password_hash, balance=balance, initial_deposit=balance)
+    user = User(email=email, password=password_hash, balance_cents=balance_cents, initial_deposit_cents=balance_cents)
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    valuation_engine.set_cash(user.id, user.balance_cents)
+    leaderboard.update(user.id, user.balance_cents)
     return user
 
 async def authenticate_user(email: str, password: str, db: AsyncSession) -> Optional[User]:
@@ -76,25 +94,45 @@ async def authenticate_user(email: str, password: str, db: AsyncSession) -> Opti
     user = result.scalar_one_or_none()
     if not user:
         return None
-    if not bcrypt.checkpw(password.encode(), user.password.encode()):
+    if not await check_password(password, user.password):
         return None
     return user
 
 # ----------------------------
-# Dependency for protected routes
+# Dependencies for protected routes
 # ----------------------------
-async def get_current_user(
-    x_auth_header: Optional[str] = Header(None, alias="X-Auth-Header"),
-    db: AsyncSession = Depends(get_db)
-):
+async def get_current_user(x_auth_header: Optional[str] = Header(None, alias="X-Auth-Header")) -> Principal:
+    """The caller as a cached Principal; the token store and DB are only hit on a cache miss."""
     if not x_auth_header:
         raise HTTPException(401, detail="Missing X-Auth-Header")
-    user_id = validate_token(x_auth_header)
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
+    principal = principal_cache.get(x_auth_header)
+    if principal is not None:
+        return principal
+    user_id = await validate_token(x_auth_header)
+    async with SessionLocal() as db:
+        row = (await db.execute(
+            select(User.id, User.email, User.balance_cents).where(User.id == user_id)
+        )).first()
+    if not row:
         raise HTTPException(404, detail="User not found")
-    return user
+    principal = Principal(*row)
+    principal_cache.put(x_auth_header, principal)
+    return principal
+
+async def get_current_user_id(x_auth_header: Optional[str] = Header(None, alias="X-Auth-Header")) -> int:
+    """Just the caller's id, for handlers that never read the user row.
+
+    Served from the principal cache; a miss loads and caches the principal
+    so the next poll with the same token touches neither the token store nor the DB.
+    """
+    return (await get_current_user(x_auth_header)).id
+
+async def require_ops_token(x_ops_token: Optional[str] = Header(None, alias="X-Ops-Token")):
+    """Gate operational endpoints behind OPS_TOKEN; they do not exist when it is unset."""
+    if not OPS_TOKEN:
+        raise HTTPException(404, detail="Not Found")
+    if not x_ops_token or not hmac.compare_digest(x_ops_token.encode(), OPS_TOKEN.encode()):
+        raise HTTPException(403, detail="Invalid X-Ops-Token")
 
 # ----------------------------
 # Routes
@@ -103,9 +141,9 @@ async def get_current_user(
 async def signup(payload: SignupIn, db: AsyncSession = Depends(get_db)):
     if payload.password != payload.confirm_password:
         raise HTTPException(400, detail="Passwords do not match")
-    hashed = bcrypt.hashpw(payload.password.encode(), bcrypt.gensalt()).decode()
-    user = await create_user(payload.email, hashed, payload.balance, db)
-    token = make_token(user.id)
+    hashed = await hash_password(payload.password)
+    user = await create_user(payload.email, hashed, to_cents(payload.balance), db)
+    token = await make_token(user.id)
     return TokenOut(access_token=token, user_id=user.id)
 
 @router.post("/login", response_model=TokenOut)
@@ -113,5 +151,14 @@ async def login(payload: LoginIn, db: AsyncSession = Depends(get_db)):
     user = await authenticate_user(payload.email, payload.password, db)
     if not user:
         raise HTTPException(401, detail="Invalid email or password")
-    token = make_token(user.id)
+    token = await make_token(user.id)
     return TokenOut(access_token=token, user_id=user.id)
+
+@router.get("/me", response_model=MeOut)
+async def me(current_user: Principal = Depends(get_current_user)):
+    return MeOut(user_id=current_user.id, email=current_user.email, balance=format_cents(current_user.balance_cents))
+
+@router.get("/cache/stats", dependencies=[Depends(require_ops_token)], include_in_schema=False)
+async def cache_stats():
+    """Principal cache size and hit rate, for sizing PRINCIPAL_CACHE_SIZE / PRINCIPAL_CACHE_TTL_SECONDS."""
+    return principal_cache.stats()
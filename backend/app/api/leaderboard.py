@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from pydantic import BaseModel
+from app.api.auth import validate_token
+from app.leaderboard import leaderboard
+from app.money import format_cents
+
+router = APIRouter(prefix="/leaderboard", tags=["Leaderboard"])
+
+# ============================================================
+# Schemas
+# ============================================================
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    display_name: str
+    total_value: str
+    is_me: bool = False
+
+class LeaderboardOut(BaseModel):
+    total_users: int
+    updated_at: datetime | None = None
+    top: list[LeaderboardEntry]
+    my_rank: int | None = None
+    around_me: list[LeaderboardEntry] | None = None
+
+
+# ============================================================
+# /leaderboard
+# ============================================================
+@router.get("", response_model=LeaderboardOut)
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    around_me: int = Query(0, ge=0, le=50, description="Neighbours to return on each side of the caller"),
+    x_auth_header: Optional[str] = Header(None, alias="X-Auth-Header"),
+):
+    """Top users by total account value, plus the caller's rank and neighbours when signed in.
+
+    Ranks come from the in-memory leaderboard re-ranked every price tick
+    and after every trade, so no database read is needed. Users are shown
+    by an opaque label, never anything derived from their email.
+    """
+    if around_me and not x_auth_header:
+        raise HTTPException(401, detail="around_me requires X-Auth-Header")
+    me = await validate_token(x_auth_header) if x_auth_header else None
+
+    top = leaderboard.top(limit)
+    nearby = leaderboard.around(me, around_me) if me is not None and around_me else None
+
+    def entry(rank, user_id, value):
+        return LeaderboardEntry(
+            rank=rank,
+            user_id=user_id,
+            display_name=f"user {user_id}",
+            total_value=format_cents(value),
+            is_me=user_id == me,
+        )
+
+    return LeaderboardOut(
+        total_users=len(leaderboard),
+        updated_at=leaderboard.updated_at,
+        top=[entry(*e) for e in top],
+        my_rank=leaderboard.rank(me) if me is not None else None,
+        around_me=[entry(*e) for e in nearby] if nearby is not None else None,
+    )
@@ -1,8 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import math
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete
 from sqlalchemy.future import select
 from app.database import SessionLocal
-from app.models import TeamMarketInformation
+from app.models import Trades, Order, BasketConstituent
+from app.api.auth import get_current_user
+from app.principal_cache import Principal
+from app.baskets import Basket, basket_registry, is_etf
+from app.price_book import price_book
+from app.candles import CANDLE_INTERVALS, choose_interval, load_candles, load_candle_closes
+from app.price_history import load_ticks, first_timestamp, earliest_timestamp
+from app import history_export
+from app.downsample import DOWNSAMPLE_METHODS, downsample_points
+from app.price_updater import PRICE_TICK_SECONDS
+from app.market_stream import market_broadcaster
+from app.money import format_cents, to_dollars
 
 router = APIRouter(prefix="/market", tags=["Market"])
 
@@ -15,74 +34,391 @@ async def get_db():
 
 
 # ============================================================
-# Constants
+# Helpers
 # ============================================================
-DIVISIONS = {
-    "AFC North", "AFC South", "AFC East", "AFC West",
-    "NFC North", "NFC South", "NFC East", "NFC West"
-}
+def group_instruments(latest: dict) -> dict:
+    """Format {name: (value, timestamp)} as sorted 'teams' and 'etfs' lists."""
+    teams, etfs = [], []
+    for name, (value, timestamp) in latest.items():
+        item = {
+            "team_name": name,
+            "value": format_cents(value),
+            "timestamp": timestamp,
+            "type": "ETF" if is_etf(name) else "Team"
+        }
+        (etfs if is_etf(name) else teams).append(item)
+
+    return {
+        "teams": sorted(teams, key=lambda x: x["team_name"]),
+        "etfs": sorted(etfs, key=lambda x: x["team_name"])
+    }
+
 
-def is_etf(name: str) -> bool:
-    return name in DIVISIONS
+def is_not_modified(request: Request, etag: str, last_modified) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the book."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return any(tag.strip() in (etag, etag[2:], "*") for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
 
 
 # ============================================================
 # /team/{team_name} — Price History for a Single Instrument
 # ============================================================
 @router.get("/team/{team_name}")
-async def get_team_value(team_name: str, db: AsyncSession = Depends(get_db)):
-    """Return full price history for a given team or ETF."""
-    result = await db.execute(
-        select(TeamMarketInformation)
-        .where(TeamMarketInformation.team_name == team_name)
-        .order_by(TeamMarketInformation.timestamp.asc())
-    )
-    rows = result.scalars().all()
+async def get_team_value(
+    team_name: str,
+    response: Response,
+    interval: str = Query("auto", description="auto, raw, 1m, 5m, 1h or 1d"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    after: Optional[datetime] = Query(None, description="Keyset cursor: points strictly after this time"),
+    before: Optional[datetime] = Query(None, description="Keyset cursor: points strictly before this time"),
+    max_points: Optional[int] = Query(None, ge=3, le=10000, description="Downsample to at most this many points"),
+    downsample: str = Query("lttb", description="lttb or minmax"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Return price history for a given team or ETF, as raw ticks or OHLC candles.
+
+    With ``interval=auto`` the resolution is picked so that the requested
+    range stays within a few hundred points. When ``limit`` is given the
+    ``X-Next-Cursor``/``X-Prev-Cursor`` headers carry the ``after``/``before``
+    values for the adjacent pages. ``max_points`` thins the result with
+    LTTB (or min/max per bucket) after the page is fetched.
+    """
+    if interval not in ("auto", "raw", *CANDLE_INTERVALS):
+        raise HTTPException(400, detail=f"Unknown interval '{interval}'")
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(400, detail=f"Unknown downsample method '{downsample}'")
+
+    if interval == "auto":
+        first = start or after
+        if first is None:
+            first = await first_timestamp(db, team_name)
+        if first is None:
+            raise HTTPException(status_code=404, detail=f"Instrument '{team_name}' not found")
+        interval = choose_interval(first, end or before or datetime.utcnow(), PRICE_TICK_SECONDS)
 
-    if not rows:
-        raise HTTPException(status_code=404, detail=f"Instrument '{team_name}' not found")
+    kind = "ETF" if is_etf(team_name) else "Team"
 
-    return [
-        {
-            "team_name": r.team_name,
-            "value": r.value,
-            "timestamp": r.timestamp,
-            "type": "ETF" if is_etf(r.team_name) else "Team"
+    if interval == "raw":
+        rows = await load_ticks(db, team_name, start, end, after, before, limit)
+        points = [
+            {"team_name": team_name, "value": to_dollars(value), "timestamp": ts, "type": kind}
+            for value, ts in rows
+        ]
+    else:
+        candles = await load_candles(db, team_name, interval, start, end, after, before, limit)
+        points = [
+            {
+                "team_name": team_name,
+                "value": to_dollars(c["close_cents"]),
+                "timestamp": c["bucket_start"],
+                "open": to_dollars(c["open_cents"]),
+                "high": to_dollars(c["high_cents"]),
+                "low": to_dollars(c["low_cents"]),
+                "close": to_dollars(c["close_cents"]),
+                "interval": interval,
+                "type": kind,
+            }
+            for c in candles
+        ]
+
+    if not points:
+        if after is None and before is None:
+            raise HTTPException(status_code=404, detail=f"Instrument '{team_name}' not found")
+        return points
+
+    if limit is not None:
+        response.headers["X-Prev-Cursor"] = points[0]["timestamp"].isoformat()
+        response.headers["X-Next-Cursor"] = points[-1]["timestamp"].isoformat()
+    return downsample_points(points, max_points, downsample, key=lambda p: (p["timestamp"], p["value"]))
+
+
+# ============================================================
+# /history, /quote — Many Instruments in One Round Trip
+# ============================================================
+def parse_instruments(teams: Optional[str]) -> list:
+    """Split a comma-separated instrument list (default: every listed instrument)."""
+    if not teams:
+        return sorted(price_book.snapshot())
+    names = list(dict.fromkeys(name.strip() for name in teams.split(",") if name.strip()))
+    unknown = [name for name in names if name not in price_book]
+    if unknown:
+        raise HTTPException(404, detail=f"Unknown instruments: {', '.join(unknown)}")
+    return names
+
+
+def aligned_series(closes: dict, instruments: list) -> dict:
+    """Turn {timestamp: {name: value}} into a shared timestamp array plus one value array per name."""
+    timestamps = sorted(closes)
+    return {
+        "timestamps": timestamps,
+        "series": {name: [closes[ts].get(name) for ts in timestamps] for name in instruments},
+    }
+
+
+@router.get("/history")
+async def get_market_history(
+    teams: str = Query(..., description="Comma-separated instruments"),
+    interval: str = Query("auto", description="auto, raw, 1m, 5m, 1h or 1d"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Price history for several instruments on one aligned time axis.
+
+    Candle intervals are served from one IN query over the candle table and
+    raw ticks from one set-based scan, instead of one request per chart.
+    ``series`` values are closes (raw prices for ``raw``); gaps are null.
+    """
+    if interval not in ("auto", "raw", *CANDLE_INTERVALS):
+        raise HTTPException(400, detail=f"Unknown interval '{interval}'")
+    instruments = parse_instruments(teams)
+
+    if interval == "auto":
+        first = start or await earliest_timestamp(db, instruments)
+        if first is None:
+            raise HTTPException(404, detail="No price history for these instruments")
+        interval = choose_interval(first, end or datetime.utcnow(), PRICE_TICK_SECONDS)
+
+    if interval == "raw":
+        closes = {}
+        async for stamps, columns in history_export.iter_history(instruments, start, end):
+            for i, ts in enumerate(stamps):
+                closes[ts] = {name: values[i] for name, values in columns.items() if not math.isnan(values[i])}
+    else:
+        closes = {
+            ts: {name: to_dollars(cents) for name, cents in row.items()}
+            for ts, row in (await load_candle_closes(db, instruments, interval, start, end)).items()
         }
-        for r in rows
-    ]
+    return {"interval": interval, **aligned_series(closes, instruments)}
+
+
+@router.get("/quote")
+async def get_market_quote(
+    teams: Optional[str] = Query(None, description="Comma-separated instruments (default: all)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Latest price for several instruments, straight from the in-memory book."""
+    if not price_book.warmed:
+        await price_book.warm(db)
+    quotes = {}
+    for name in parse_instruments(teams):
+        value, timestamp = price_book.get(name)
+        quotes[name] = {"value": format_cents(value), "timestamp": timestamp, "type": "ETF" if is_etf(name) else "Team"}
+    return {"seq": price_book.seq, "quotes": quotes}
+
+
+# ============================================================
+# /history/export — Columnar Bulk Export
+# ============================================================
+@router.get("/history/export")
+async def export_market_history(
+    teams: Optional[str] = Query(None, description="Comma-separated instruments (default: all)"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query("parquet", description="csv, npz, arrow or parquet"),
+    layout: str = Query("wide", description="wide (one column per instrument) or long"),
+):
+    """Stream price history for many instruments as one columnar file.
+
+    Rows are read with a server-side cursor and written batch by batch, so
+    memory stays flat regardless of the range (NPZ excepted, as a zip of
+    whole arrays).
+    """
+    if format not in history_export.EXPORT_FORMATS:
+        raise HTTPException(400, detail=f"Unknown format '{format}'")
+    if layout not in ("wide", "long"):
+        raise HTTPException(400, detail=f"Unknown layout '{layout}'")
+    if format in ("arrow", "parquet") and history_export.pa is None:
+        raise HTTPException(501, detail=f"{format} export requires pyarrow on the server")
+
+    instruments = parse_instruments(teams)
+    media_type, extension = history_export.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        history_export.export_history(instruments, start, end, format, layout),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="market_history_{layout}.{extension}"'},
+    )
 
 
 # ============================================================
 # /all-teams — Latest Prices for All Teams and ETFs
 # ============================================================
 @router.get("/all-teams")
-async def get_all_teams(db: AsyncSession = Depends(get_db)):
+async def get_all_teams(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """
     Return the latest price per instrument (teams + division ETFs),
     separated into 'teams' and 'etfs' groups for frontend rendering.
+
+    Carries ETag / Last-Modified validators and answers 304 Not Modified
+    when the client already has the current tick.
     """
-    result = await db.execute(select(TeamMarketInformation))
-    rows = result.scalars().all()
+    if not price_book.warmed:
+        await price_book.warm(db)
 
-    # Keep only the latest entry per unique team_name
-    latest = {}
-    for r in rows:
-        if r.team_name not in latest or r.timestamp > latest[r.team_name].timestamp:
-            latest[r.team_name] = r
+    etag = f'W/"{price_book.epoch}-{price_book.seq}"'
+    last_modified = price_book.last_modified
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
 
-    teams, etfs = [], []
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
 
-    for name, rec in latest.items():
-        item = {
-            "team_name": rec.team_name,
-            "value": f"{rec.value:.2f}",
-            "timestamp": rec.timestamp,
-            "type": "ETF" if is_etf(name) else "Team"
-        }
-        (etfs if is_etf(name) else teams).append(item)
+    response.headers.update(headers)
+    return group_instruments(price_book.snapshot())
+
+
+# ============================================================
+# /deltas — Instruments Changed Since a Sequence Number
+# ============================================================
+@router.get("/deltas")
+async def get_market_deltas(since: int = Query(0, ge=0), db: AsyncSession = Depends(get_db)):
+    """Return only instruments whose price changed after tick ``since``.
+
+    Pass the returned ``seq`` as ``since`` on the next call. ``full`` is true
+    when ``since`` is unknown to this process (e.g. after a restart) and the
+    response therefore carries every instrument. ``removed`` lists
+    instruments delisted since then, which clients should drop.
+    """
+    if not price_book.warmed:
+        await price_book.warm(db)
+
+    full = since == 0 or since > price_book.seq
+    changed = price_book.snapshot() if full else price_book.changed_since(since)
+    removed = [] if full else price_book.removed_since(since)
+    return {"seq": price_book.seq, "full": full, "removed": removed, **group_instruments(changed)}
+
+
+# ============================================================
+# /stream, /ws — Push Each Tick Instead of Polling
+# ============================================================
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/stream")
+async def stream_market(request: Request):
+    """Server-Sent Events feed of every price tick (same shape as /all-teams)."""
+    async def events():
+        queue = market_broadcaster.subscribe()
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            market_broadcaster.unsubscribe(queue)
 
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def market_websocket(websocket: WebSocket):
+    """WebSocket feed of every price tick (same shape as /all-teams)."""
+    await websocket.accept()
+    queue = market_broadcaster.subscribe()
+    try:
+        while True:
+            await websocket.send_text(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        market_broadcaster.unsubscribe(queue)
+
+
+# ============================================================
+# /baskets — Custom Weighted ETFs
+# ============================================================
+class BasketIn(BaseModel):
+    name: str = Field(min_length=1, max_length=50)
+    weights: dict[str, float] = Field(min_length=1)
+
+
+def basket_out(basket: Basket) -> dict:
+    latest = price_book.get(basket.name)
     return {
-        "teams": sorted(teams, key=lambda x: x["team_name"]),
-        "etfs": sorted(etfs, key=lambda x: x["team_name"])
+        "name": basket.name,
+        "kind": basket.kind,
+        "owner_id": basket.owner_id,
+        "weights": basket.weights,
+        "value": format_cents(latest[0]) if latest else None,
     }
+
+
+@router.get("/baskets")
+async def list_baskets():
+    """Every basket ETF (built-in and custom) with its constituents and live value."""
+    return [basket_out(b) for b in sorted(basket_registry, key=lambda b: b.name)]
+
+
+@router.post("/baskets", status_code=201)
+async def create_basket(payload: BasketIn, current_user: Principal = Depends(get_current_user),
+                        db: AsyncSession = Depends(get_db)):
+    """Create a custom basket priced as sum(weight * team price) every tick."""
+    name = payload.name.strip()
+    if not name or "," in name:
+        raise HTTPException(400, detail="Basket names must be non-empty and cannot contain ','")
+    if name in basket_registry or name in price_book:
+        raise HTTPException(409, detail=f"'{name}' is already a listed instrument")
+    for team, weight in payload.weights.items():
+        if weight <= 0:
+            raise HTTPException(400, detail=f"Weight for '{team}' must be positive")
+        if is_etf(team) or team not in price_book:
+            raise HTTPException(400, detail=f"Unknown team '{team}'")
+
+    db.add_all([
+        BasketConstituent(basket_name=name, owner_id=current_user.id, team_name=team, weight=weight)
+        for team, weight in payload.weights.items()
+    ])
+    await db.commit()
+
+    basket = Basket(name, payload.weights, "custom", current_user.id)
+    basket_registry.register(basket)
+    # Price it now so it is tradable before the next tick
+    entries = [price_book.get(team) for team in basket.weights]
+    value = basket.value_of({team: entry[0] for team, entry in zip(basket.weights, entries)})
+    price_book.update([(name, value, max(ts for _, ts in entries))])
+    return basket_out(basket)
+
+
+@router.delete("/baskets/{name}")
+async def delete_basket(name: str, current_user: Principal = Depends(get_current_user),
+                        db: AsyncSession = Depends(get_db)):
+    """Delist a custom basket owned by the caller, if nobody has traded it or has an open order on it."""
+    basket = basket_registry.get(name)
+    if basket is None or basket.kind != "custom":
+        raise HTTPException(404, detail=f"Custom basket '{name}' not found")
+    if basket.owner_id != current_user.id:
+        raise HTTPException(403, detail="Only the basket owner can delete it")
+    traded = (await db.execute(select(Trades.id).where(Trades.team_name == name).limit(1))).first()
+    if traded:
+        raise HTTPException(409, detail=f"'{name}' has trades and cannot be deleted")
+    pending = (await db.execute(
+        select(Order.id).where(Order.team_name == name, Order.status == "open").limit(1)
+    )).first()
+    if pending:
+        raise HTTPException(409, detail=f"'{name}' has open orders and cannot be deleted")
+
+    await db.execute(delete(BasketConstituent).where(BasketConstituent.basket_name == name))
+    await db.commit()
+    basket_registry.unregister(name)
+    price_book.remove(name)
+    return {"success": True, "name": name}
@@ -1,13 +1,23 @@
 from datetime import datetime
-from decimal import Decimal
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Literal, Optional
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
-from sqlalchemy import desc
 from app.database import SessionLocal
-from app.models import User, Trades, TeamMarketInformation, PortfolioHistory
-from app.api.auth import get_current_user
+from app.models import User, Trades, PortfolioHistory, Order
+from app.api.auth import get_current_user, get_current_user_id
+from app.principal_cache import Principal
+from app.price_book import price_book
+from app.price_history import AsOfPriceIndex
+from app.baskets import is_etf
+from app.positions import load_positions, replay_trades, apply_fill
+from app.execution import execute_legs, TradeRejected
+from app.downsample import DOWNSAMPLE_METHODS, downsample_indices
+from app.orders import order_book
+from app.money import format_cents, to_cents, mul_div_cents
 
 router = APIRouter(prefix="/trades", tags=["Trades"])
 
@@ -22,6 +32,14 @@ class SellIn(BaseModel):
     team_name: str
     quantity: int = Field(gt=0)
 
+class LegIn(BaseModel):
+    team_name: str
+    action: Literal["buy", "sell"]
+    quantity: int = Field(gt=0)
+
+class BatchIn(BaseModel):
+    legs: list[LegIn] = Field(min_length=1, max_length=100)
+
 class TradeOut(BaseModel):
     success: bool
     team_name: str
@@ -31,6 +49,35 @@ class TradeOut(BaseModel):
     type: str | None = None
     message: str | None = None
 
+class BatchOut(BaseModel):
+    success: bool
+    balance: str
+    fills: list[TradeOut]
+
+class OrderIn(BaseModel):
+    team_name: str
+    action: Literal["buy", "sell"]
+    order_type: Literal["limit", "stop", "stop_limit"]
+    quantity: int = Field(gt=0)
+    limit_price: float | None = Field(None, gt=0)
+    stop_price: float | None = Field(None, gt=0)
+
+class OrderOut(BaseModel):
+    id: int
+    team_name: str
+    action: str
+    order_type: str
+    quantity: int
+    limit_price: str | None = None
+    stop_price: str | None = None
+    status: str
+    created_at: datetime
+    triggered_at: datetime | None = None
+    filled_at: datetime | None = None
+    fill_price: str | None = None
+    message: str | None = None
+    type: str | None = None
+
 class PositionOut(BaseModel):
     team_name: str
     quantity: int
@@ -59,61 +106,27 @@ async def get_db():
 # ============================================================
 # Helpers
 # ============================================================
-DIVISIONS = {
-    "AFC North", "AFC South", "AFC East", "AFC West",
-    "NFC North", "NFC South", "NFC East", "NFC West"
-}
-
-def is_etf(name: str) -> bool:
-    return name in DIVISIONS
-
-
-async def get_current_price(db: AsyncSession, team_name: str) -> Decimal:
-    """Get the latest market price for any instrument (team or ETF)."""
-    res = await db.execute(
-        select(TeamMarketInformation)
-        .where(TeamMarketInformation.team_name == team_name)
-        .order_by(desc(TeamMarketInformation.timestamp))
-        .limit(1)
-    )
-    info = res.scalar_one_or_none()
-    if not info or info.value is None:
+async def get_current_price(db: AsyncSession, team_name: str) -> int:
+    """Get the latest market price in cents for any instrument (team or ETF)."""
+    latest = await price_book.lookup(db, team_name)
+    if latest is None:
         raise HTTPException(404, detail=f"No price data for '{team_name}'")
-    return Decimal(str(info.value))
+    return latest[0]
 
 
 async def compute_positions(db: AsyncSession, user_id: int):
-    """Compute user holdings and unrealized PnL."""
-    res_trades = await db.execute(select(Trades).where(Trades.user_id == user_id))
-    trades = res_trades.scalars().all()
-
-    positions = {}
-    for t in trades:
-        if t.team_name not in positions:
-            positions[t.team_name] = {"qty": 0, "cost": Decimal("0"), "last_txn": t.timestamp}
-        if t.action == "buy":
-            positions[t.team_name]["qty"] += t.quantity
-            positions[t.team_name]["cost"] += Decimal(str(t.price)) * t.quantity
-        elif t.action == "sell":
-            positions[t.team_name]["qty"] -= t.quantity
-            if positions[t.team_name]["qty"] <= 0:
-                positions[t.team_name]["qty"] = 0
-                positions[t.team_name]["cost"] = Decimal("0")
-        if t.timestamp > positions[t.team_name]["last_txn"]:
-            positions[t.team_name]["last_txn"] = t.timestamp
+    """Compute user holdings and unrealized PnL from the materialized positions."""
+    positions = await load_positions(db, user_id)
 
     portfolio = []
-    total_value = Decimal("0")
-    total_unrealized = Decimal("0")
+    total_value = 0
+    total_unrealized = 0
 
-    for team, data in positions.items():
-        qty = data["qty"]
-        if qty <= 0:
-            continue
-        avg_buy_price = data["cost"] / qty
+    for position in positions:
+        team, qty = position.team_name, position.quantity
+        cost_basis = position.cost_basis_cents
         current_price = await get_current_price(db, team)
         position_value = current_price * qty
-        cost_basis = avg_buy_price * qty
         unrealized_pnl = position_value - cost_basis
 
         total_value += position_value
@@ -122,12 +135,12 @@ async def compute_positions(db: AsyncSession, user_id: int):
         portfolio.append(PositionOut(
             team_name=team,
             quantity=qty,
-            avg_buy_price=f"{avg_buy_price:.2f}",
-            current_price=f"{current_price:.2f}",
-            position_value=f"{position_value:.2f}",
-            cost_basis=f"{cost_basis:.2f}",
-            unrealized_pnl=f"{unrealized_pnl:.2f}",
-            last_transaction=data["last_txn"].strftime("%Y-%m-%d %H:%M:%S"),
+            avg_buy_price=format_cents(mul_div_cents(cost_basis, 1, qty)),
+            current_price=format_cents(current_price),
+            position_value=format_cents(position_value),
+            cost_basis=format_cents(cost_basis),
+            unrealized_pnl=format_cents(unrealized_pnl),
+            last_transaction=position.last_txn.strftime("%Y-%m-%d %H:%M:%S"),
             type="ETF" if is_etf(team) else "Team"
         ))
 
@@ -138,44 +151,22 @@ async def compute_positions(db: AsyncSession, user_id: int):
 # /buy
 # ============================================================
 @router.post("/buy", response_model=TradeOut)
-async def buy_stock(payload: BuyIn, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def buy_stock(payload: BuyIn, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Buy shares of a team or ETF."""
-    exists = await db.execute(
-        select(TeamMarketInformation.team_name)
-        .where(TeamMarketInformation.team_name == payload.team_name)
-        .limit(1)
-    )
-    if not exists.scalar_one_or_none():
-        raise HTTPException(404, detail=f"'{payload.team_name}' not found in market data")
-
-    user = (await db.execute(select(User).where(User.id == current_user.id))).scalar_one()
-    price = await get_current_price(db, payload.team_name)
-    cost = price * payload.quantity
-    balance = Decimal(str(user.balance))
-
-    if balance < cost:
-        raise HTTPException(400, detail=f"Insufficient balance (${balance:.2f} < ${cost:.2f})")
-
-    user.balance = float(balance - cost)
-    db.add(Trades(
-        user_id=user.id,
-        team_name=payload.team_name,
-        action="buy",
-        quantity=payload.quantity,
-        price=float(price),
-        balance_after_trade=user.balance,
-        timestamp=datetime.utcnow()
-    ))
-    await db.commit()
+    leg = {"team_name": payload.team_name, "action": "buy", "quantity": payload.quantity}
+    try:
+        user, (fill,) = await execute_legs(db, current_user.id, [leg])
+    except TradeRejected as exc:
+        raise HTTPException(404 if exc.reason == "unknown_instrument" else 400, detail=exc.message)
 
     return TradeOut(
         success=True,
         team_name=payload.team_name,
         quantity=payload.quantity,
-        price=f"{price:.2f}",
-        balance=f"{user.balance:.2f}",
+        price=format_cents(fill["price_cents"]),
+        balance=format_cents(user.balance_cents),
         type="ETF" if is_etf(payload.team_name) else "Team",
-        message=f"Bought {payload.quantity} {payload.team_name} @ ${price:.2f}"
+        message=f"Bought {payload.quantity} {payload.team_name} @ ${format_cents(fill['price_cents'])}"
     )
 
 
@@ -183,76 +174,179 @@ async def buy_stock(payload: BuyIn, current_user: User = Depends(get_current_use
 # /sell
 # ============================================================
 @router.post("/sell", response_model=TradeOut)
-async def sell_stock(payload: SellIn, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def sell_stock(payload: SellIn, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Sell shares of a team or ETF."""
-    exists = await db.execute(
-        select(TeamMarketInformation.team_name)
-        .where(TeamMarketInformation.team_name == payload.team_name)
-        .limit(1)
-    )
-    if not exists.scalar_one_or_none():
-        raise HTTPException(404, detail=f"'{payload.team_name}' not found in market data")
-
-    user = (await db.execute(select(User).where(User.id == current_user.id))).scalar_one()
-    res = await db.execute(select(Trades).where(Trades.user_id == user.id, Trades.team_name == payload.team_name))
-    trades = res.scalars().all()
-    owned_qty = sum(t.quantity if t.action == "buy" else -t.quantity for t in trades)
-
-    if owned_qty < payload.quantity:
+    leg = {"team_name": payload.team_name, "action": "sell", "quantity": payload.quantity}
+    try:
+        user, (fill,) = await execute_legs(db, current_user.id, [leg])
+    except TradeRejected as exc:
+        if exc.reason == "unknown_instrument":
+            raise HTTPException(404, detail=exc.message)
         return TradeOut(
             success=False,
             team_name=payload.team_name,
             quantity=0,
             price="0.00",
-            balance=f"{user.balance:.2f}",
+            balance=format_cents(exc.details["balance_cents"]),
             type="ETF" if is_etf(payload.team_name) else "Team",
-            message=f"Sell failed: You only have {owned_qty} {payload.team_name}."
+            message=f"Sell failed: {exc.message}"
         )
 
-    price = await get_current_price(db, payload.team_name)
-    proceeds = price * payload.quantity
-    user.balance = float(Decimal(str(user.balance)) + proceeds)
-
-    db.add(Trades(
-        user_id=user.id,
+    return TradeOut(
+        success=True,
         team_name=payload.team_name,
-        action="sell",
         quantity=payload.quantity,
-        price=float(price),
-        balance_after_trade=user.balance,
-        timestamp=datetime.utcnow()
-    ))
-    await db.commit()
+        price=format_cents(fill["price_cents"]),
+        balance=format_cents(user.balance_cents),
+        type="ETF" if is_etf(payload.team_name) else "Team",
+        message=f"Sold {payload.quantity} {payload.team_name} @ ${format_cents(fill['price_cents'])}"
+    )
 
-    return TradeOut(
+
+# ============================================================
+# /batch — Many Legs, One Price Snapshot, One Transaction
+# ============================================================
+@router.post("/batch", response_model=BatchOut)
+async def batch_trade(payload: BatchIn, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Execute several buy/sell legs atomically: all fill or none do.
+
+    Every leg is priced from the same price snapshot and sells settle before
+    buys, so a rebalance can fund its buys from its own sells.
+    """
+    legs = [leg.model_dump() for leg in payload.legs]
+    try:
+        user, fills = await execute_legs(db, current_user.id, legs)
+    except TradeRejected as exc:
+        detail = {"reason": exc.reason, "message": exc.message}
+        if exc.leg is not None:
+            detail["leg"] = legs.index(exc.leg)
+        raise HTTPException(404 if exc.reason == "unknown_instrument" else 400, detail=detail)
+
+    return BatchOut(
         success=True,
+        balance=format_cents(user.balance_cents),
+        fills=[
+            TradeOut(
+                success=True,
+                team_name=fill["team_name"],
+                quantity=fill["quantity"],
+                price=format_cents(fill["price_cents"]),
+                balance=format_cents(fill["balance_after_trade_cents"]),
+                type="ETF" if is_etf(fill["team_name"]) else "Team",
+                message=f"{'Bought' if fill['action'] == 'buy' else 'Sold'} {fill['quantity']} "
+                        f"{fill['team_name']} @ ${format_cents(fill['price_cents'])}"
+            )
+            for fill in fills
+        ]
+    )
+
+
+# ============================================================
+# /orders — Resting Limit, Stop and Stop-Limit Orders
+# ============================================================
+def order_out(order: Order) -> OrderOut:
+    money = lambda cents: format_cents(cents) if cents is not None else None
+    return OrderOut(
+        id=order.id,
+        team_name=order.team_name,
+        action=order.action,
+        order_type=order.order_type,
+        quantity=order.quantity,
+        limit_price=money(order.limit_price_cents),
+        stop_price=money(order.stop_price_cents),
+        status=order.status,
+        created_at=order.created_at,
+        triggered_at=order.triggered_at,
+        filled_at=order.filled_at,
+        fill_price=money(order.fill_price_cents),
+        message=order.message,
+        type="ETF" if is_etf(order.team_name) else "Team",
+    )
+
+
+@router.post("/orders", response_model=OrderOut, status_code=201)
+async def place_order(payload: OrderIn, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Rest an order until a price tick crosses its trigger.
+
+    Limit orders fill at the first tick at or better than ``limit_price``;
+    stop orders fill at the first tick through ``stop_price``; stop-limit
+    orders become limit orders once their stop is hit. Funds and holdings
+    are checked when the order fills, through the same path as /buy and /sell.
+    """
+    if payload.order_type in ("limit", "stop_limit") and payload.limit_price is None:
+        raise HTTPException(400, detail=f"{payload.order_type} orders need a limit_price")
+    if payload.order_type in ("stop", "stop_limit") and payload.stop_price is None:
+        raise HTTPException(400, detail=f"{payload.order_type} orders need a stop_price")
+    await get_current_price(db, payload.team_name)
+
+    order = Order(
+        user_id=current_user.id,
         team_name=payload.team_name,
+        action=payload.action,
+        order_type=payload.order_type,
         quantity=payload.quantity,
-        price=f"{price:.2f}",
-        balance=f"{user.balance:.2f}",
-        type="ETF" if is_etf(payload.team_name) else "Team",
-        message=f"Sold {payload.quantity} {payload.team_name} @ ${price:.2f}"
+        limit_price_cents=to_cents(payload.limit_price) if payload.order_type != "stop" else None,
+        stop_price_cents=to_cents(payload.stop_price) if payload.order_type != "limit" else None,
+        status="open",
+        created_at=datetime.utcnow(),
+    )
+    db.add(order)
+    await db.commit()
+    order_book.add(order)
+    return order_out(order)
+
+
+@router.get("/orders", response_model=list[OrderOut])
+async def list_orders(
+    status: Optional[Literal["open", "filled", "cancelled", "rejected"]] = Query(None),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """The user's orders, newest first, optionally filtered by status."""
+    query = select(Order).where(Order.user_id == user_id)
+    if status is not None:
+        query = query.where(Order.status == status)
+    res = await db.execute(query.order_by(Order.id.desc()))
+    return [order_out(order) for order in res.scalars().all()]
+
+
+@router.delete("/orders/{order_id}", response_model=OrderOut)
+async def cancel_order(order_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Cancel an open order; orders that already filled or were rejected cannot be cancelled."""
+    order = await db.get(Order, order_id)
+    if order is None or order.user_id != current_user.id:
+        raise HTTPException(404, detail="Order not found")
+    # Conditional update: loses cleanly to a tick that is filling the order right now
+    res = await db.execute(
+        update(Order).where(Order.id == order_id, Order.status == "open").values(status="cancelled")
     )
+    await db.commit()
+    if res.rowcount != 1:
+        await db.refresh(order)
+        raise HTTPException(409, detail=f"Order is already {order.status}")
+    order_book.discard(order_id)
+    await db.refresh(order)
+    return order_out(order)
 
 
 # ============================================================
 # /portfolio
 # ============================================================
 @router.get("/portfolio", response_model=PortfolioOut)
-async def get_all_holdings(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_all_holdings(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
     """Return all holdings with unrealized PnL."""
-    portfolio, total_value, total_unrealized = await compute_positions(db, current_user.id)
+    portfolio, total_value, total_unrealized = await compute_positions(db, user_id)
     return PortfolioOut(
         positions=portfolio,
-        total_value=f"{total_value:.2f}",
-        total_unrealized_pnl=f"{total_unrealized:.2f}"
+        total_value=format_cents(total_value),
+        total_unrealized_pnl=format_cents(total_unrealized)
     )
 
 
 @router.get("/portfolio:{index}", response_model=PositionOut)
-async def get_single_holding(index: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_single_holding(index: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
     """Return a specific holding by index."""
-    portfolio, _, _ = await compute_positions(db, current_user.id)
+    portfolio, _, _ = await compute_positions(db, user_id)
     if not portfolio:
         raise HTTPException(404, detail="No holdings")
     if index < 1 or index > len(portfolio):
@@ -264,33 +358,48 @@ async def get_single_holding(index: int, current_user: User = Depends(get_curren
 # /portfolio/history (live)
 # ============================================================
 @router.get("/portfolio/history")
-async def get_live_history(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Return portfolio balance history from background updater."""
-    res = await db.execute(
-        select(PortfolioHistory.timestamp, PortfolioHistory.balance)
-        .where(PortfolioHistory.user_id == current_user.id)
+async def get_live_history(
+    max_points: Optional[int] = Query(None, ge=3, le=10000, description="Downsample to at most this many points"),
+    downsample: str = Query("lttb", description="lttb or minmax"),
+    since: Optional[datetime] = Query(None, description="Keyset cursor: only snapshots after this time"),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Return portfolio balance history from background updater.
+
+    Pass the returned ``cursor`` as ``since`` on the next poll to receive
+    only snapshots recorded after it.
+    """
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(400, detail=f"Unknown downsample method '{downsample}'")
+    query = (
+        select(PortfolioHistory.timestamp, PortfolioHistory.balance_cents)
+        .where(PortfolioHistory.user_id == user_id)
         .order_by(PortfolioHistory.timestamp.asc())
     )
-    rows = res.all()
+    if since is not None:
+        query = query.where(PortfolioHistory.timestamp > since)
+    rows = (await db.execute(query)).all()
     if not rows:
-        return {"user_id": current_user.id, "history": []}
+        return {"user_id": user_id, "history": [], "cursor": since.isoformat() if since else None}
 
+    keep = downsample_indices([ts for ts, _ in rows], [bal for _, bal in rows], max_points, downsample)
     history = [
-        {"timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"), "balance": f"{bal:.2f}"}
-        for ts, bal in rows
+        {"timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"), "balance": format_cents(bal)}
+        for ts, bal in (rows[i] for i in keep.tolist())
     ]
-    return {"user_id": current_user.id, "history": history}
+    return {"user_id": user_id, "history": history, "cursor": rows[-1][0].isoformat()}
 
 
 # ============================================================
 # /portfolio/history/current
 # ============================================================
 @router.get("/portfolio/history/current")
-async def get_current_snapshot(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_current_snapshot(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
     """Return the most recent portfolio snapshot."""
     res = await db.execute(
-        select(PortfolioHistory.timestamp, PortfolioHistory.balance)
-        .where(PortfolioHistory.user_id == current_user.id)
+        select(PortfolioHistory.timestamp, PortfolioHistory.balance_cents)
+        .where(PortfolioHistory.user_id == user_id)
         .order_by(PortfolioHistory.timestamp.desc())
         .limit(1)
     )
@@ -298,7 +407,7 @@ async def get_current_snapshot(current_user: User = Depends(get_current_user), d
     if not row:
         return {"message": "No balance history found"}
     ts, bal = row
-    return {"timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"), "balance": f"{bal:.2f}"}
+    return {"timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"), "balance": format_cents(bal)}
 
 
 # ============================================================
@@ -308,69 +417,95 @@ async def compute_history(db: AsyncSession, user_id: int):
     """Recompute portfolio history from trades."""
     user = (await db.execute(select(User).where(User.id == user_id))).scalar_one()
     trades = (await db.execute(select(Trades).where(Trades.user_id == user_id).order_by(Trades.timestamp.asc()))).scalars().all()
-    initial = Decimal(str(user.initial_deposit))
+    initial = user.initial_deposit_cents
     holdings, cost_basis, history = {}, {}, []
 
     if not trades:
         now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
         return [{
             "timestamp": now,
-            "initial_deposit": f"{initial:.2f}",
-            "current_total_account_value": f"{initial:.2f}",
-            "current_cash_balance": f"{initial:.2f}",
+            "initial_deposit": format_cents(initial),
+            "current_total_account_value": format_cents(initial),
+            "current_cash_balance": format_cents(initial),
             "cost_basis": "0.00",
             "pnl": "0.00"
         }]
 
-    async def get_price_at(team: str, t: datetime) -> Decimal:
-        res = await db.execute(
-            select(TeamMarketInformation)
-            .where(TeamMarketInformation.team_name == team,
-                   TeamMarketInformation.timestamp <= t)
-            .order_by(TeamMarketInformation.timestamp.desc())
-            .limit(1)
+    # Every price this replay needs, resolved from one in-memory as-of index
+    times = [tr.timestamp for tr in trades]
+    teams = {tr.team_name for tr in trades}
+    index = await AsOfPriceIndex.load(db, teams, times[0], times[-1])
+    prices_at_trades = {team: np.nan_to_num(index.values_at(team, times)).astype(np.int64) for team in teams}
+
+    for i, tr in enumerate(trades):
+        team = tr.team_name
+        if tr.action == "sell" and holdings.get(team, 0) < tr.quantity:
+            continue
+        holdings[team], cost_basis[team] = apply_fill(
+            holdings.get(team, 0), cost_basis.get(team, 0), tr.action, tr.quantity, tr.price_cents
         )
-        rec = res.scalar_one_or_none()
-        return Decimal(str(rec.value)) if rec and rec.value else Decimal("0")
-
-    for tr in trades:
-        team, price, qty = tr.team_name, Decimal(str(tr.price)), tr.quantity
-        if tr.action == "buy":
-            holdings[team] = holdings.get(team, 0) + qty
-            cost_basis[team] = cost_basis.get(team, Decimal("0")) + (price * qty)
-        elif tr.action == "sell":
-            if holdings.get(team, 0) < qty:
-                continue
-            avg_cost = cost_basis.get(team, Decimal("0")) / Decimal(max(holdings[team], 1))
-            holdings[team] -= qty
-            cost_basis[team] -= avg_cost * qty
-            if holdings[team] <= 0:
-                cost_basis[team] = Decimal("0")
 
         total_cost = sum(cost_basis.values())
         cash = initial - total_cost
-        value = Decimal("0")
-        for tm, q in holdings.items():
-            if q > 0:
-                value += await get_price_at(tm, tr.timestamp) * q
+        value = sum(int(prices_at_trades[tm][i]) * q for tm, q in holdings.items() if q > 0)
         total_value = cash + value
         pnl = total_value - initial
         history.append({
             "timestamp": tr.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            "initial_deposit": f"{initial:.2f}",
-            "current_total_account_value": f"{total_value:.2f}",
-            "current_cash_balance": f"{cash:.2f}",
-            "cost_basis": f"{total_cost:.2f}",
-            "pnl": f"{pnl:.2f}"
+            "initial_deposit": format_cents(initial),
+            "current_total_account_value": format_cents(total_value),
+            "current_cash_balance": format_cents(cash),
+            "cost_basis": format_cents(total_cost),
+            "pnl": format_cents(pnl)
         })
 
     return history
 
 
 @router.get("/portfolio/history/recomputed")
-async def get_recomputed_history(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_recomputed_history(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
     """Legacy recomputed portfolio history from trade records."""
-    history = await compute_history(db, current_user.id)
-    return {"user_id": current_user.id, "history": history}
+    history = await compute_history(db, user_id)
+    return {"user_id": user_id, "history": history}
 
 
+# ============================================================
+# /portfolio/value — Portfolio Value at an Arbitrary Time
+# ============================================================
+@router.get("/portfolio/value")
+async def get_portfolio_value_at(
+    at: Optional[datetime] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Cash plus holdings valued at the last prices known at time ``at`` (default now)."""
+    at = at or datetime.utcnow()
+    user = (await db.execute(select(User).where(User.id == user_id))).scalar_one()
+    trades = (await db.execute(
+        select(Trades)
+        .where(Trades.user_id == user.id, Trades.timestamp <= at)
+        .order_by(Trades.timestamp.asc(), Trades.id.asc())
+    )).scalars().all()
+
+    cash = trades[-1].balance_after_trade_cents if trades else user.initial_deposit_cents
+    holdings = {team: qty for (_, team), (qty, _, _) in replay_trades(trades).items() if qty > 0}
+    index = await AsOfPriceIndex.load(db, holdings, at, at)
+
+    positions, holdings_value = [], 0
+    for team, qty in holdings.items():
+        price = index.price_at(team, at) or 0
+        holdings_value += price * qty
+        positions.append({
+            "team_name": team,
+            "quantity": qty,
+            "price": format_cents(price),
+            "value": format_cents(price * qty),
+        })
+    return {
+        "user_id": user.id,
+        "timestamp": at.strftime("%Y-%m-%d %H:%M:%S"),
+        "cash_balance": format_cents(cash),
+        "holdings_value": format_cents(holdings_value),
+        "total_value": format_cents(cash + holdings_value),
+        "positions": positions,
+    }
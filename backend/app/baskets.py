@@ -0,0 +1,150 @@
+import numpy as np
+from sqlalchemy import select
+from app.models import BasketConstituent
+from app.money import round_cents
+
+# ============================================================
+# Built-in Baskets (use your city names exactly)
+# ============================================================
+DIVISION_MAP = {
+    "AFC North": ["Baltimore", "Cincinnati", "Cleveland", "Pittsburgh"],
+    "AFC South": ["Houston", "Indianapolis", "Jacksonville", "Tennessee"],
+    "AFC East": ["Buffalo", "Miami", "New England", "New York J"],
+    "AFC West": ["Denver", "Kansas City", "Las Vegas", "Los Angeles C"],
+    "NFC North": ["Chicago", "Detroit", "Green Bay", "Minnesota"],
+    "NFC South": ["Atlanta", "Carolina", "New Orleans", "Tampa Bay"],
+    "NFC East": ["Dallas", "New York G", "Philadelphia", "Washington"],
+    "NFC West": ["Arizona", "Los Angeles R", "San Francisco", "Seattle"],
+}
+CONFERENCE_MAP = {
+    conference: [team for division, members in DIVISION_MAP.items()
+                 if division.startswith(conference) for team in members]
+    for conference in ("AFC", "NFC")
+}
+LEAGUE_NAME = "NFL"
+
+
+class Basket:
+    """A named, weighted set of teams priced as ``sum(weight * price)``, rounded to whole cents."""
+
+    def __init__(self, name: str, weights: dict, kind: str = "custom", owner_id: int = None):
+        self.name = name
+        self.weights = dict(weights)
+        self.kind = kind
+        self.owner_id = owner_id
+
+    @classmethod
+    def equal_weight(cls, name: str, members: list, kind: str) -> "Basket":
+        """Average of the members' prices, like the original division ETFs."""
+        return cls(name, {team: 1 / len(members) for team in members}, kind)
+
+    def value_of(self, prices: dict):
+        """Price the basket from {team: cents}, or None if a constituent is missing."""
+        try:
+            return int(round_cents(sum(w * prices[team] for team, w in self.weights.items())))
+        except KeyError:
+            return None
+
+
+def builtin_baskets() -> list:
+    baskets = [Basket.equal_weight(name, members, "division") for name, members in DIVISION_MAP.items()]
+    baskets += [Basket.equal_weight(name, members, "conference") for name, members in CONFERENCE_MAP.items()]
+    league = [team for members in DIVISION_MAP.values() for team in members]
+    baskets.append(Basket.equal_weight(LEAGUE_NAME, league, "league"))
+    return baskets
+
+
+# ============================================================
+# Basket Registry (sparse weight matrix x price vector)
+# ============================================================
+class BasketRegistry:
+    """Every tradable basket, evaluated in one vectorised step per tick.
+
+    Weights are held as a sparse baskets x instruments matrix in COO form;
+    pricing all baskets is one gather-multiply plus ``np.bincount``, so cost
+    grows with the number of constituents, not with DB rows.
+    """
+
+    def __init__(self):
+        self._baskets = {b.name: b for b in builtin_baskets()}
+        self._version = 0
+        self._plan = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._baskets
+
+    def __iter__(self):
+        return iter(list(self._baskets.values()))
+
+    def __len__(self) -> int:
+        return len(self._baskets)
+
+    def get(self, name: str):
+        return self._baskets.get(name)
+
+    def names(self) -> list:
+        return list(self._baskets)
+
+    def register(self, basket: Basket):
+        self._baskets[basket.name] = basket
+        self._version += 1
+
+    def unregister(self, name: str):
+        if self._baskets.pop(name, None) is not None:
+            self._version += 1
+
+    async def load(self, session):
+        """(Re)load built-in baskets plus every custom basket stored in the database."""
+        baskets = {b.name: b for b in builtin_baskets()}
+        res = await session.execute(
+            select(BasketConstituent.basket_name, BasketConstituent.owner_id,
+                   BasketConstituent.team_name, BasketConstituent.weight)
+        )
+        for name, owner_id, team, weight in res.all():
+            basket = baskets.setdefault(name, Basket(name, {}, "custom", owner_id))
+            basket.weights[team] = weight
+        self._baskets = baskets
+        self._version += 1
+
+    def _build_plan(self, instruments: tuple):
+        index = {name: i for i, name in enumerate(instruments)}
+        names, rows, cols, weights = [], [], [], []
+        for basket in self._baskets.values():
+            if not basket.weights or any(team not in index for team in basket.weights):
+                continue
+            row = len(names)
+            names.append(basket.name)
+            for team, weight in basket.weights.items():
+                rows.append(row)
+                cols.append(index[team])
+                weights.append(weight)
+        self._plan = (
+            self._version, instruments, names,
+            np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp), np.array(weights, dtype=float),
+        )
+
+    def evaluate(self, instruments, prices: np.ndarray):
+        """Price every basket from a cents vector aligned with ``instruments``.
+
+        Returns (basket_names, int64 cents). Baskets with a constituent
+        missing from ``instruments`` are skipped.
+        """
+        instruments = tuple(instruments)
+        if self._plan is None or self._plan[0] != self._version or self._plan[1] != instruments:
+            self._build_plan(instruments)
+        _, _, names, rows, cols, weights = self._plan
+        values = np.bincount(rows, weights=weights * prices[cols], minlength=len(names))
+        return names, round_cents(values)
+
+    def evaluate_dict(self, prices: dict) -> dict:
+        """Convenience wrapper over ``evaluate`` for {team: cents} input."""
+        teams = sorted(name for name in prices if name not in self._baskets)
+        names, values = self.evaluate(teams, np.array([prices[t] for t in teams], dtype=np.int64))
+        return dict(zip(names, values.tolist()))
+
+
+basket_registry = BasketRegistry()
+
+
+def is_etf(name: str) -> bool:
+    return name in basket_registry
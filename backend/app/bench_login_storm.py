@@ -0,0 +1,98 @@
+# bench_login_storm.py
+import argparse
+import asyncio
+import secrets
+import time
+from collections import Counter
+import httpx
+import numpy as np
+from sqlalchemy import delete
+from app.database import SessionLocal
+from app.models import User
+from app.price_book import price_book
+from app.baskets import basket_registry
+from app.main_api import app
+from app.api import auth
+from app.passwords import PasswordHasher, PASSWORD_HASH_WORKERS, BCRYPT_ROUNDS
+
+
+# ============================================================
+# Storm
+# ============================================================
+async def poll(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    """GET /market/all-teams every ``interval`` until ``stop``; returns latencies in ms.
+
+    Latency runs from when the poll was due, not when it was sent, so time
+    spent waiting on a blocked event loop is counted.
+    """
+    latencies = []
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        r = await client.get("/market/all-teams")
+        r.raise_for_status()
+        latencies.append((time.perf_counter() - due) * 1000)
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient, email: str, password: str, logins: int, interval: float):
+    stop = asyncio.Event()
+    poller = asyncio.create_task(poll(client, stop, interval))
+    await asyncio.sleep(0.2)  # a few idle polls first
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/auth/login", json={"email": email, "password": password}) for _ in range(logins)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return np.array(await poller), Counter(r.status_code for r in responses), elapsed
+
+
+def report(label: str, latencies: np.ndarray, statuses: Counter, elapsed: float):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"📊 {label:<28} /market/all-teams p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  max {latencies.max():7.1f} ms "
+          f"({len(latencies)} polls) | logins {dict(statuses)} in {elapsed:.2f}s")
+
+
+# ============================================================
+# Entrypoint
+# ============================================================
+async def run(logins: int, workers: int, rounds: int, max_queue: int, interval: float):
+    password = secrets.token_hex(8)
+    hasher = PasswordHasher(workers=workers, rounds=rounds, max_queue=max_queue)
+    async with SessionLocal() as session:
+        await basket_registry.load(session)
+        await price_book.warm(session)
+        user = User(email=f"storm-{secrets.token_hex(3)}@example.com", password=await hasher.hash(password),
+                    balance_cents=0, initial_deposit_cents=0)
+        session.add(user)
+        await session.commit()
+
+    print(f"🔐 {logins} concurrent logins at bcrypt cost {rounds}")
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Before: bcrypt on the event loop, as the handlers used to call it
+            auth.password_hasher = PasswordHasher(workers=0, rounds=rounds)
+            report("before (inline bcrypt)", *await storm(client, user.email, password, logins, interval))
+            # After: bounded thread pool with a wait queue
+            auth.password_hasher = hasher
+            report(f"after ({workers} workers, queue {max_queue})",
+                   *await storm(client, user.email, password, logins, interval))
+    finally:
+        hasher.shutdown()
+        async with SessionLocal() as session:
+            await session.execute(delete(User).where(User.id == user.id))
+            await session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p99 latency of /market/all-teams during a login storm, "
+                                                 "with bcrypt inline vs on the bounded pool.")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=max(PASSWORD_HASH_WORKERS, 1))
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--interval", type=float, default=0.01, help="Pause between polls (seconds)")
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.workers, args.rounds, args.max_queue, args.interval))
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func, and_
+from app.database import SessionLocal
+from app.models import TeamMarketInformation, PriceCandle
+from app.baskets import basket_registry, is_etf
+
+# ============================================================
+# Candle Intervals
+# ============================================================
+CANDLE_INTERVALS = {
+    "1m": timedelta(minutes=1),
+    "5m": timedelta(minutes=5),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+MAX_CHART_POINTS = 500
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp: datetime, interval: str) -> datetime:
+    """Floor a naive UTC timestamp to the start of its candle bucket."""
+    step = CANDLE_INTERVALS[interval]
+    return EPOCH + ((timestamp - EPOCH) // step) * step
+
+
+def choose_interval(start: datetime, end: datetime, tick_seconds: float) -> str:
+    """Pick the finest resolution that keeps [start, end] under MAX_CHART_POINTS."""
+    span = max((end - start).total_seconds(), 0)
+    if span / tick_seconds <= MAX_CHART_POINTS:
+        return "raw"
+    for interval, step in CANDLE_INTERVALS.items():
+        if span / step.total_seconds() <= MAX_CHART_POINTS:
+            return interval
+    return "1d"
+
+
+# ============================================================
+# Incremental Aggregator
+# ============================================================
+class CandleAggregator:
+    """Fold price ticks (integer cents) into open OHLC candles for every interval.
+
+    ``add_tick`` returns the candles whose bucket just closed so the caller can
+    persist them in the same transaction as the tick itself.
+    """
+
+    def __init__(self, intervals=CANDLE_INTERVALS):
+        self._open = {interval: {} for interval in intervals}
+
+    def add_tick(self, prices: dict, timestamp: datetime) -> list:
+        """Apply {name: value} at ``timestamp``; return candles that closed."""
+        closed = []
+        for interval, candles in self._open.items():
+            bucket = bucket_start(timestamp, interval)
+            for name, value in prices.items():
+                candle = candles.get(name)
+                if candle is not None and candle["bucket_start"] == bucket:
+                    candle["high_cents"] = max(candle["high_cents"], value)
+                    candle["low_cents"] = min(candle["low_cents"], value)
+                    candle["close_cents"] = value
+                    continue
+                if candle is not None:
+                    closed.append(candle)
+                candles[name] = {
+                    "team_name": name,
+                    "interval": interval,
+                    "bucket_start": bucket,
+                    "open_cents": value,
+                    "high_cents": value,
+                    "low_cents": value,
+                    "close_cents": value,
+                }
+        return closed
+
+    def flush(self) -> list:
+        """Return and forget every open candle."""
+        candles = [c for open_candles in self._open.values() for c in open_candles.values()]
+        self._open = {interval: {} for interval in self._open}
+        return candles
+
+    def current(self, name: str, interval: str):
+        """Return the in-progress candle for an instrument, if any."""
+        candle = self._open.get(interval, {}).get(name)
+        return dict(candle) if candle else None
+
+    async def warm(self, session, latest_prices: dict, now: datetime):
+        """Seed open candles from raw ticks already written in the current buckets."""
+        for interval, candles in self._open.items():
+            bucket = bucket_start(now, interval)
+            stats = (
+                select(
+                    TeamMarketInformation.team_name,
+                    func.min(TeamMarketInformation.timestamp).label("first_ts"),
+                    func.max(TeamMarketInformation.value_cents).label("high"),
+                    func.min(TeamMarketInformation.value_cents).label("low"),
+                )
+                .where(TeamMarketInformation.timestamp >= bucket)
+                .group_by(TeamMarketInformation.team_name)
+                .subquery()
+            )
+            res = await session.execute(
+                select(stats.c.team_name, TeamMarketInformation.value_cents, stats.c.high, stats.c.low)
+                .join(
+                    TeamMarketInformation,
+                    and_(
+                        TeamMarketInformation.team_name == stats.c.team_name,
+                        TeamMarketInformation.timestamp == stats.c.first_ts,
+                    ),
+                )
+            )
+            for name, open_value, high, low in res.all():
+                # Basket candles start from the next tick; any raw rows for them are legacy
+                if name not in latest_prices or is_etf(name):
+                    continue
+                candles[name] = {
+                    "team_name": name,
+                    "interval": interval,
+                    "bucket_start": bucket,
+                    "open_cents": open_value,
+                    "high_cents": high,
+                    "low_cents": low,
+                    "close_cents": latest_prices[name],
+                }
+
+
+candle_aggregator = CandleAggregator()
+
+
+# ============================================================
+# Reads
+# ============================================================
+async def load_candles(session, team_name: str, interval: str, start=None, end=None,
+                       after=None, before=None, limit=None) -> list:
+    """Return persisted candles plus the live in-progress one, oldest first.
+
+    ``after``/``before`` are exclusive keyset cursors on ``bucket_start``;
+    with ``before`` the newest ``limit`` candles preceding it are returned.
+    Prices are integer cents.
+    """
+    query = select(
+        PriceCandle.bucket_start, PriceCandle.open_cents, PriceCandle.high_cents,
+        PriceCandle.low_cents, PriceCandle.close_cents,
+    ).where(PriceCandle.team_name == team_name, PriceCandle.interval == interval)
+    if start is not None:
+        query = query.where(PriceCandle.bucket_start >= bucket_start(start, interval))
+    if end is not None:
+        query = query.where(PriceCandle.bucket_start <= end)
+    if after is not None:
+        query = query.where(PriceCandle.bucket_start > after)
+    if before is not None:
+        query = query.where(PriceCandle.bucket_start < before)
+
+    newest_first = before is not None and after is None
+    order = PriceCandle.bucket_start.desc() if newest_first else PriceCandle.bucket_start.asc()
+    query = query.order_by(order)
+    if limit is not None:
+        query = query.limit(limit)
+
+    rows = (await session.execute(query)).all()
+    if newest_first:
+        rows.reverse()
+    candles = [
+        {"bucket_start": ts, "open_cents": o, "high_cents": h, "low_cents": l, "close_cents": c}
+        for ts, o, h, l, c in rows
+    ]
+
+    live = candle_aggregator.current(team_name, interval)
+    if live is None:
+        return candles
+    bucket = live["bucket_start"]
+    in_range = (
+        (end is None or bucket <= end)
+        and (after is None or bucket > after)
+        and (before is None or bucket < before)
+    )
+    if not in_range:
+        return candles
+    if candles and candles[-1]["bucket_start"] == bucket:
+        candles.pop()
+    elif limit is not None and len(candles) >= limit:
+        if not newest_first:
+            return candles  # the live candle belongs to a later page
+        candles.pop(0)
+    candles.append({k: live[k] for k in ("bucket_start", "open_cents", "high_cents", "low_cents", "close_cents")})
+    return candles
+
+
+async def load_candle_closes(session, names: list, interval: str, start=None, end=None) -> dict:
+    """Return {bucket_start: {name: close_cents}} for many instruments in one query.
+
+    Live in-progress candles are merged in, as in ``load_candles``.
+    """
+    query = (
+        select(PriceCandle.bucket_start, PriceCandle.team_name, PriceCandle.close_cents)
+        .where(PriceCandle.team_name.in_(names), PriceCandle.interval == interval)
+    )
+    if start is not None:
+        query = query.where(PriceCandle.bucket_start >= bucket_start(start, interval))
+    if end is not None:
+        query = query.where(PriceCandle.bucket_start <= end)
+
+    closes = {}
+    for bucket, name, close in (await session.execute(query)).all():
+        closes.setdefault(bucket, {})[name] = close
+    for name in names:
+        live = candle_aggregator.current(name, interval)
+        if live is not None and (end is None or live["bucket_start"] <= end):
+            closes.setdefault(live["bucket_start"], {})[name] = live["close_cents"]
+    return closes
+
+
+# ============================================================
+# Backfill Job
+# ============================================================
+async def _day_candles(session, day: datetime, day_end: datetime, batch_size: int) -> list:
+    """Every candle built from raw ticks in [day, day_end), baskets derived per timestamp."""
+    aggregator = CandleAggregator()
+    candles = []
+
+    def add_group(ts, prices):
+        prices.update(basket_registry.evaluate_dict(prices))
+        candles.extend(aggregator.add_tick(prices, ts))
+
+    ticks = await session.stream(
+        select(TeamMarketInformation.team_name, TeamMarketInformation.value_cents, TeamMarketInformation.timestamp)
+        .where(TeamMarketInformation.timestamp >= day, TeamMarketInformation.timestamp < day_end)
+        .order_by(TeamMarketInformation.timestamp.asc())
+        .execution_options(yield_per=batch_size)
+    )
+    group_ts, group = None, {}
+    async for team, value, ts in ticks:
+        if value is None or is_etf(team):
+            continue
+        if ts != group_ts:
+            if group:
+                add_group(group_ts, group)
+            group_ts, group = ts, {}
+        group[team] = value
+    if group:
+        add_group(group_ts, group)
+    return candles + aggregator.flush()
+
+
+async def backfill_candles(start: datetime = None, end: datetime = None, batch_size: int = 5000):
+    """Rebuild every closed candle in [start, end) from raw ticks.
+
+    Basket candles are derived from their constituents' ticks at each
+    timestamp; stored raw rows under a basket name are ignored. Work goes one
+    UTC day at a time (every bucket falls inside one day): each day's
+    candles are built in memory, then its old candles are deleted and the new
+    ones inserted in a single transaction, so readers never see a gap and a
+    crash leaves each day either old or rebuilt.
+    """
+    end = end or datetime.utcnow()
+    async with SessionLocal() as session:
+        await basket_registry.load(session)
+        if start is None:
+            start = (await session.execute(select(func.min(TeamMarketInformation.timestamp)))).scalar()
+            if start is None:
+                print("⚠️ No raw ticks to backfill")
+                return
+    start = bucket_start(start, "1d")
+
+    written = 0
+    day = start
+    while day < end:
+        day_end = min(day + CANDLE_INTERVALS["1d"], end)
+        async with SessionLocal() as session:
+            candles = await _day_candles(session, day, day_end, batch_size)
+        rows = [r for r in candles if r["bucket_start"] + CANDLE_INTERVALS[r["interval"]] <= end]
+
+        async with SessionLocal() as session:
+            for interval, step in CANDLE_INTERVALS.items():
+                await session.execute(
+                    delete(PriceCandle).where(
+                        PriceCandle.interval == interval,
+                        PriceCandle.bucket_start >= day,
+                        PriceCandle.bucket_start < day_end,
+                        PriceCandle.bucket_start <= end - step,
+                    )
+                )
+            for i in range(0, len(rows), batch_size):
+                await session.execute(insert(PriceCandle), rows[i:i + batch_size])
+            await session.commit()
+        written += len(rows)
+        day += CANDLE_INTERVALS["1d"]
+
+    print(f"🕯️ Backfilled {written} candles from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill OHLC candles from raw price ticks.")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(backfill_candles(args.start, args.end))
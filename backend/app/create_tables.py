@@ -1,6 +1,7 @@
 # create_tables.py
 import asyncio
 from app.database import engine, Base
+from sqlalchemy import inspect, text
 from app.models import TeamMarketInformation
 
 async def create_tables():
@@ -8,6 +9,30 @@ async def create_tables():
         print("Creating all tables...")
         await conn.run_sync(Base.metadata.create_all)
         print("Tables created successfully!")
+        print("Creating missing indexes on existing tables...")
+        await conn.run_sync(create_missing_indexes)
+        print("Indexes up to date!")
+
+# Indexes superseded by a composite one; dropped so inserts stop maintaining them
+REDUNDANT_INDEXES = {
+    "team_market_information": ["ix_team_market_information_team_name"],
+}
+
+def create_missing_indexes(sync_conn):
+    """create_all skips indexes on tables that already exist, so add them here."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+    inspector = inspect(sync_conn)
+    for table_name, index_names in REDUNDANT_INDEXES.items():
+        existing = {ix["name"] for ix in inspector.get_indexes(table_name)}
+        for name in index_names:
+            if name in existing:
+                if sync_conn.dialect.name == "mysql":
+                    sync_conn.execute(text(f"DROP INDEX {name} ON {table_name}"))
+                else:
+                    sync_conn.execute(text(f"DROP INDEX {name}"))
 
 if __name__ == "__main__":
     asyncio.run(create_tables())
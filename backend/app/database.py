@@ -4,6 +4,17 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv("MYSQL_PUBLIC_URL")  # pulled from Railway env
 
-engine = create_async_engine(DATABASE_URL.replace("mysql://", "mysql+aiomysql://"), echo=True)
+# Engine / pool tuning
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"  # log every statement (slow: synchronous logging)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"  # drop connections the server closed
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; keep below MySQL wait_timeout
+
+engine_options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+if not DATABASE_URL.startswith("sqlite"):
+    engine_options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+
+engine = create_async_engine(DATABASE_URL.replace("mysql://", "mysql+aiomysql://"), **engine_options)
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
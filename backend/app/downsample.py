@@ -0,0 +1,87 @@
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+# ============================================================
+# Chart Downsampling (index selection over x/y columns)
+# ============================================================
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``max_points`` visually representative points.
+
+    The first and last points are always kept. Each bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket; the per-bucket search is
+    vectorised, so cost is O(n) numpy work plus one Python step per bucket.
+    """
+    n = len(x)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max_points], dtype=np.intp)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[lo:hi] - py) - (px - x[lo:hi]) * (avg_y - py))
+        previous = lo + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Keep the min and max of each of ``max_points // 2`` equal-count buckets.
+
+    Preserves every spike exactly, at the cost of some shape smoothing
+    compared with LTTB.
+    """
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 2:
+        return np.array([0][:max_points], dtype=np.intp)
+
+    y = np.asarray(y, dtype=float)
+    buckets = max_points // 2
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+    starts = edges[:-1]
+    # reduceat gives per-bucket extremes; recover their positions within each bucket
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    is_low = y == lows[bucket_of]
+    is_high = y == highs[bucket_of]
+    first_low = np.full(buckets, n)
+    first_high = np.full(buckets, n)
+    positions = np.arange(n)
+    np.minimum.at(first_low, bucket_of[is_low], positions[is_low])
+    np.minimum.at(first_high, bucket_of[is_high], positions[is_high])
+    return np.unique(np.concatenate([first_low, first_high]))
+
+
+def downsample_indices(timestamps, values, max_points: int, method: str = "lttb") -> np.ndarray:
+    """Indices to keep so that at most ``max_points`` points remain, oldest first."""
+    if max_points is None or len(values) <= max_points:
+        return np.arange(len(values))
+    if method == "minmax":
+        return minmax_indices(np.asarray(values, dtype=float), max_points)
+    x = np.asarray(timestamps, dtype="datetime64[us]").astype(np.int64).astype(float)
+    return lttb_indices(x, np.asarray(values, dtype=float), max_points)
+
+
+def downsample_points(points: list, max_points: int, method: str = "lttb", key=lambda p: p) -> list:
+    """Downsample a list of points; ``key`` maps a point to (timestamp, value)."""
+    if max_points is None or len(points) <= max_points:
+        return points
+    pairs = [key(p) for p in points]
+    keep = downsample_indices([t for t, _ in pairs], [v for _, v in pairs], max_points, method)
+    return [points[i] for i in keep.tolist()]
@@ -0,0 +1,137 @@
+import asyncio
+import weakref
+from datetime import datetime
+from sqlalchemy import select, insert
+from app.models import User, Trades
+from app.price_book import price_book
+from app.positions import get_positions, fill_position
+from app.valuation import valuation_engine
+from app.leaderboard import leaderboard
+from app.principal_cache import principal_cache
+from app.money import format_cents
+
+
+class TradeRejected(Exception):
+    """A leg failed validation; nothing from its batch was written."""
+
+    def __init__(self, reason: str, message: str, leg: dict = None, **details):
+        super().__init__(message)
+        self.reason = reason  # "unknown_instrument", "insufficient_funds" or "insufficient_holdings"
+        self.message = message
+        self.leg = leg
+        self.details = details
+
+
+# ============================================================
+# Per-User Serialisation
+# ============================================================
+_user_locks = weakref.WeakValueDictionary()
+
+
+def user_lock(user_id: int) -> asyncio.Lock:
+    """In-process lock for one user's orders; dropped once no order holds it."""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = _user_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+# ============================================================
+# Shared Execution Path (single orders, batches, triggered orders)
+# ============================================================
+async def execute_legs(db, user_id: int, legs: list, prices: dict = None) -> tuple:
+    """Validate and execute buy/sell legs for one user in a single transaction.
+
+    ``legs`` are dicts with team_name, action ("buy"/"sell") and quantity.
+    Every leg is priced from one snapshot of the price book (or from
+    ``prices``, {team: cents}, when given); sells are applied before buys
+    so their proceeds fund the buys, and all Trades rows go in with one
+    bulk insert before one commit. Raises TradeRejected (and writes
+    nothing) if any leg fails. All money is integer cents.
+
+    Returns (user, fills) where each fill is the leg plus price_cents and
+    balance_after_trade_cents.
+
+    Orders for the same user are serialised: in-process by a per-user
+    asyncio lock, and across workers by locking the user row
+    (SELECT ... FOR UPDATE) for the whole read-modify-write. Orders for
+    different users never wait on each other.
+    """
+    async with user_lock(user_id):
+        try:
+            return await _execute_locked(db, user_id, legs, prices)
+        except TradeRejected:
+            await db.rollback()  # release the row lock before reporting
+            raise
+
+
+async def _execute_locked(db, user_id: int, legs: list, prices: dict) -> tuple:
+    if prices is None:
+        prices = {name: value for name, (value, _) in price_book.snapshot().items()}
+    quotes = {}
+    for team in {leg["team_name"] for leg in legs}:
+        value = prices.get(team)
+        if value is None:
+            # Cold miss: fall back to the database once
+            entry = await price_book.lookup(db, team)
+            if entry is None:
+                raise TradeRejected("unknown_instrument", f"'{team}' not found in market data", team_name=team)
+            value = entry[0]
+        quotes[team] = int(value)
+
+    user = (await db.execute(
+        select(User).where(User.id == user_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)  # never trust a balance loaded before the lock
+    )).scalar_one()
+    positions = await get_positions(db, user.id, quotes)
+    holdings = {team: p.quantity for team, p in positions.items()}
+
+    balance = user.balance_cents
+    now = datetime.utcnow()
+    fills = []
+    for leg in sorted(legs, key=lambda leg: leg["action"] != "sell"):
+        team, qty = leg["team_name"], leg["quantity"]
+        price = quotes[team]
+        amount = price * qty
+        if leg["action"] == "sell":
+            owned = holdings.get(team, 0)
+            if owned < qty:
+                raise TradeRejected("insufficient_holdings", f"You only have {owned} {team}.",
+                                    leg, owned=owned, balance_cents=balance)
+            holdings[team] = owned - qty
+            balance += amount
+        else:
+            if balance < amount:
+                raise TradeRejected("insufficient_funds",
+                                    f"Insufficient balance (${format_cents(balance)} < ${format_cents(amount)})",
+                                    leg, balance_cents=balance)
+            holdings[team] = holdings.get(team, 0) + qty
+            balance -= amount
+        fills.append({**leg, "price_cents": price, "balance_after_trade_cents": balance})
+
+    user.balance_cents = balance
+    await db.execute(insert(Trades), [
+        {
+            "user_id": user.id,
+            "team_name": fill["team_name"],
+            "action": fill["action"],
+            "quantity": fill["quantity"],
+            "price_cents": fill["price_cents"],
+            "balance_after_trade_cents": fill["balance_after_trade_cents"],
+            "timestamp": now,
+        }
+        for fill in fills
+    ])
+    for fill in fills:
+        fill_position(db, positions, user.id, fill["team_name"], fill["action"],
+                      fill["quantity"], fill["price_cents"], now)
+    await db.commit()
+    principal_cache.invalidate_user(user.id)  # cached principals carry the old balance
+
+    for team in quotes:
+        valuation_engine.set_holding(user.id, team, positions[team].quantity, user.balance_cents)
+    value = valuation_engine.value_of(user.id, {**prices, **quotes})
+    if value is not None:
+        leaderboard.update(user.id, value)
+    return user, fills
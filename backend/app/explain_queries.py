@@ -0,0 +1,114 @@
+# explain_queries.py
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, text
+from app.database import engine
+from app.models import TeamMarketInformation, PriceCandle, UserPosition, PortfolioHistory, Order
+from app.price_book import newest_rows_query
+from app.price_history import as_of_raw_query, as_of_compacted_query, raw_horizons_query
+
+# ============================================================
+# Hot Queries (must be served by an index, never a full scan)
+# ============================================================
+def hot_queries():
+    tmi = TeamMarketInformation
+    since = datetime.utcnow() - timedelta(hours=1)
+    return {
+        "latest price for team": (
+            select(tmi.value_cents, tmi.timestamp)
+            .where(tmi.team_name == "Dallas")
+            .order_by(tmi.timestamp.desc())
+            .limit(1)
+        ),
+        "history for team": (
+            select(tmi.value_cents, tmi.timestamp)
+            .where(tmi.team_name == "Dallas", tmi.timestamp >= since)
+            .order_by(tmi.timestamp.asc())
+        ),
+        "history page after cursor": (
+            select(tmi.value_cents, tmi.timestamp)
+            .where(tmi.team_name == "Dallas", tmi.timestamp > since)
+            .order_by(tmi.timestamp.asc())
+            .limit(500)
+        ),
+        "history page before cursor": (
+            select(tmi.value_cents, tmi.timestamp)
+            .where(tmi.team_name == "Dallas", tmi.timestamp < since)
+            .order_by(tmi.timestamp.desc())
+            .limit(500)
+        ),
+        "first tick for team": select(func.min(tmi.timestamp)).where(tmi.team_name == "Dallas"),
+        "candles for team": (
+            select(PriceCandle.bucket_start, PriceCandle.close_cents)
+            .where(PriceCandle.team_name == "Dallas", PriceCandle.interval == "1h",
+                   PriceCandle.bucket_start >= since)
+            .order_by(PriceCandle.bucket_start.asc())
+        ),
+        "positions for user": (
+            select(UserPosition.team_name, UserPosition.quantity, UserPosition.cost_basis_cents)
+            .where(UserPosition.user_id == 1, UserPosition.quantity > 0)
+        ),
+        "portfolio history since cursor": (
+            select(PortfolioHistory.timestamp, PortfolioHistory.balance_cents)
+            .where(PortfolioHistory.user_id == 1, PortfolioHistory.timestamp > since)
+            .order_by(PortfolioHistory.timestamp.asc())
+        ),
+        "open orders since sync": (
+            select(Order).where(Order.status == "open", Order.id > 0).order_by(Order.id.asc())
+        ),
+        "price book warm": newest_rows_query(),
+        "as-of raw prices": as_of_raw_query(["Dallas", "Houston"], since),
+        "as-of compacted closes": as_of_compacted_query(["Dallas", "Houston"], since),
+        "raw horizons for teams": raw_horizons_query(["Dallas", "Houston"]),
+    }
+
+
+# Queries that read a whole table or index on purpose: {name: why}
+ALLOWED_SCANS = {
+    "price book warm": "runs once per process start and needs the newest row of every instrument",
+}
+
+
+def full_scans(dialect: str, plan: list) -> list:
+    """Return the EXPLAIN rows that read a whole table or a whole index (SQLite or MySQL)."""
+    if dialect == "sqlite":
+        # Rows are (id, parent, notused, detail); every "SCAN" visits all rows, even
+        # "SCAN t USING (COVERING) INDEX" (a full index scan); seeks show up as "SEARCH".
+        # Scanning a materialised subquery only reads its (already filtered) result.
+        derived = {row[-1].split()[-1] for row in plan if row[-1].startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+        return [row for row in plan if row[-1].startswith("SCAN ") and row[-1].split()[1] not in derived]
+    # MySQL: access type ALL reads every row of the table, "index" every entry of an index;
+    # <derivedN> tables are subquery results, not base tables
+    return [
+        row for row in plan
+        if row._mapping.get("type") in ("ALL", "index") and not str(row._mapping.get("table")).startswith("<derived")
+    ]
+
+
+async def explain_hot_queries() -> int:
+    failures = 0
+    async with engine.connect() as conn:
+        dialect = conn.dialect.name
+        prefix = "EXPLAIN QUERY PLAN" if dialect == "sqlite" else "EXPLAIN"
+        for name, query in hot_queries().items():
+            sql = str(query.compile(conn.sync_connection, compile_kwargs={"literal_binds": True}))
+            plan = (await conn.execute(text(f"{prefix} {sql}"))).all()
+            scans = full_scans(dialect, plan)
+            if not scans:
+                print(f"✅ indexed: {name}")
+            elif name in ALLOWED_SCANS:
+                print(f"⚪ full scan allowed: {name} ({ALLOWED_SCANS[name]})")
+            else:
+                failures += 1
+                print(f"❌ FULL SCAN: {name}")
+            for row in plan:
+                print(f"    {tuple(row)}")
+    return failures
+
+
+if __name__ == "__main__":
+    failed = asyncio.run(explain_hot_queries())
+    if failed:
+        print(f"{failed} hot quer{'y' if failed == 1 else 'ies'} fell back to a full scan")
+        sys.exit(1)
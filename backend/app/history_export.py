@@ -0,0 +1,198 @@
+import csv
+import io
+import math
+import numpy as np
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models import TeamMarketInformation, PriceCandle
+from app.baskets import basket_registry
+from app.candles import bucket_start
+from app.price_history import COMPACTED_INTERVAL, oldest_raw_timestamp
+from app.money import to_dollars
+
+try:  # Arrow/Parquet export is optional
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "npz": ("application/octet-stream", "npz"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+EXPORT_BATCH_SIZE = 5000
+
+
+# ============================================================
+# Wide Batches from Server-Side Cursors
+# ============================================================
+def _wide_batch(stamps: list, groups: list, instruments: list, baskets):
+    for group in groups if baskets else ():
+        for basket in baskets:
+            value = basket.value_of(group)
+            if value is not None:
+                group[basket.name] = value
+    columns = {name: [to_dollars(g[name]) if name in g else math.nan for g in groups] for name in instruments}
+    return stamps, columns
+
+
+async def _grouped(session, query, batch_size, instruments, baskets):
+    """Stream (name, cents, timestamp) rows ordered by time into wide batches of dollars."""
+    rows = await session.stream(query.execution_options(yield_per=batch_size))
+    stamps, groups = [], []
+    current_ts, group = None, None
+    async for name, value, ts in rows:
+        if ts != current_ts:
+            if group is not None:
+                stamps.append(current_ts)
+                groups.append(group)
+                if len(stamps) >= batch_size:
+                    yield _wide_batch(stamps, groups, instruments, baskets)
+                    stamps, groups = [], []
+            current_ts, group = ts, {}
+        if value is not None:
+            group[name] = value
+    if group is not None:
+        stamps.append(current_ts)
+        groups.append(group)
+    if stamps:
+        yield _wide_batch(stamps, groups, instruments, baskets)
+
+
+async def iter_history(instruments: list, start=None, end=None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield (timestamps, {instrument: values}) batches, oldest first.
+
+    Rows are read through ``session.stream`` so at most ``batch_size``
+    timestamps are held at once. Compacted 1m closes cover the range before
+    the oldest raw tick; basket columns are derived from constituent ticks.
+    Values are dollars; missing values are NaN.
+    """
+    baskets = [basket_registry.get(name) for name in instruments if name in basket_registry]
+    teams = {name for name in instruments if name not in basket_registry}
+    for basket in baskets:
+        teams.update(basket.weights)
+
+    async with SessionLocal() as session:
+        horizon = await oldest_raw_timestamp(session, min(teams)) if teams else None
+        compacted_before = bucket_start(horizon, COMPACTED_INTERVAL) if horizon else None
+
+        # Compacted closes before the raw horizon (baskets have their own candles)
+        query = (
+            select(PriceCandle.team_name, PriceCandle.close_cents, PriceCandle.bucket_start)
+            .where(PriceCandle.team_name.in_(instruments), PriceCandle.interval == COMPACTED_INTERVAL)
+            .order_by(PriceCandle.bucket_start.asc())
+        )
+        if start is not None:
+            query = query.where(PriceCandle.bucket_start >= start)
+        if end is not None:
+            query = query.where(PriceCandle.bucket_start <= end)
+        if compacted_before is not None:
+            query = query.where(PriceCandle.bucket_start < compacted_before)
+        async for batch in _grouped(session, query, batch_size, instruments, None):
+            yield batch
+
+        if horizon is None:
+            return
+        query = (
+            select(TeamMarketInformation.team_name, TeamMarketInformation.value_cents, TeamMarketInformation.timestamp)
+            .where(TeamMarketInformation.team_name.in_(sorted(teams)),
+                   TeamMarketInformation.timestamp >= max(start or horizon, horizon))
+            .order_by(TeamMarketInformation.timestamp.asc())
+        )
+        if end is not None:
+            query = query.where(TeamMarketInformation.timestamp <= end)
+        async for batch in _grouped(session, query, batch_size, instruments, baskets):
+            yield batch
+
+
+def _long_rows(stamps: list, columns: dict):
+    """Flatten a wide batch into (timestamp, instrument, value) rows, skipping gaps."""
+    for i, ts in enumerate(stamps):
+        for name, values in columns.items():
+            if not math.isnan(values[i]):
+                yield ts, name, values[i]
+
+
+# ============================================================
+# Writers (each yields bytes as batches arrive)
+# ============================================================
+async def _write_csv(batches, instruments: list, layout: str):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["timestamp", *instruments] if layout == "wide" else ["timestamp", "instrument", "value"])
+    async for stamps, columns in batches:
+        if layout == "wide":
+            for i, ts in enumerate(stamps):
+                writer.writerow([ts.isoformat(), *("" if math.isnan(columns[n][i]) else columns[n][i]
+                                                   for n in instruments)])
+        else:
+            writer.writerows((ts.isoformat(), name, value) for ts, name, value in _long_rows(stamps, columns))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _arrow_schema(instruments: list, layout: str):
+    if layout == "wide":
+        return pa.schema([("timestamp", pa.timestamp("us"))] + [(n, pa.float64()) for n in instruments])
+    return pa.schema([("timestamp", pa.timestamp("us")), ("instrument", pa.string()), ("value", pa.float64())])
+
+
+def _arrow_batch(schema, stamps: list, columns: dict, layout: str):
+    if layout == "wide":
+        return pa.record_batch([stamps, *columns.values()], schema=schema)
+    rows = list(_long_rows(stamps, columns))
+    return pa.record_batch([list(col) for col in zip(*rows)] if rows else [[], [], []], schema=schema)
+
+
+async def _write_arrow(batches, instruments: list, layout: str, parquet: bool):
+    schema = _arrow_schema(instruments, layout)
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    async for stamps, columns in batches:
+        writer.write_batch(_arrow_batch(schema, stamps, columns, layout))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+async def _write_npz(batches, instruments: list, layout: str):
+    """NPZ is a zip of whole arrays, so it is assembled in memory and sent at the end."""
+    stamps, columns = [], {name: [] for name in instruments}
+    async for batch_stamps, batch_columns in batches:
+        stamps.extend(batch_stamps)
+        for name, values in batch_columns.items():
+            columns[name].append(np.asarray(values, dtype=float))
+    timestamps = np.array(stamps, dtype="datetime64[us]")
+    values = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in columns.items()}
+
+    if layout == "wide":
+        arrays = {"timestamp": timestamps, **values}
+    else:
+        matrix = np.column_stack([values[n] for n in instruments]) if instruments else np.empty((len(stamps), 0))
+        rows, cols = np.nonzero(~np.isnan(matrix))
+        arrays = {
+            "timestamp": timestamps[rows],
+            "instrument": np.array(instruments)[cols],
+            "value": matrix[rows, cols],
+        }
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    yield buffer.getvalue()
+
+
+def export_history(instruments: list, start=None, end=None, fmt: str = "csv", layout: str = "wide"):
+    """Return an async byte iterator of the requested columnar export."""
+    batches = iter_history(instruments, start, end)
+    if fmt == "csv":
+        return _write_csv(batches, instruments, layout)
+    if fmt == "npz":
+        return _write_npz(batches, instruments, layout)
+    return _write_arrow(batches, instruments, layout, parquet=fmt == "parquet")
@@ -0,0 +1,90 @@
+import math
+import numpy as np
+from sortedcontainers import SortedList
+
+# Above this share of changed users a tick rebuilds the list instead of moving entries
+LEADERBOARD_REBUILD_FRACTION = 0.25
+
+
+# ============================================================
+# Leaderboard (order-statistic list of account values)
+# ============================================================
+class Leaderboard:
+    """Users ranked by total account value (integer cents), highest first.
+
+    Entries are (-value, user_id) in a SortedList, so moving one user and
+    looking up a rank or a slice are O(log n). Each tick feeds in the bulk
+    valuation: only users whose value changed are moved, and when most of
+    them did the list is rebuilt from one numpy sort instead.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._sorted = SortedList()
+        self.updated_at = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def update(self, user_id: int, value: int):
+        """Move one user to their new value (cents)."""
+        value = int(value)
+        old = self._values.get(user_id)
+        if old == value:
+            return
+        if old is not None:
+            self._sorted.remove((-old, user_id))
+        self._values[user_id] = value
+        self._sorted.add((-value, user_id))
+
+    def discard(self, user_id: int):
+        old = self._values.pop(user_id, None)
+        if old is not None:
+            self._sorted.remove((-old, user_id))
+
+    def sync(self, user_ids: list, values: np.ndarray, timestamp=None):
+        """Apply one tick's valuation for every user (``values`` row-aligned with ``user_ids``)."""
+        values = np.asarray(values, dtype=np.int64)
+        # float64 holds every realistic cents value exactly and lets unknown users be NaN
+        old = np.fromiter((self._values.get(u, math.nan) for u in user_ids), dtype=float, count=len(user_ids))
+        changed = np.flatnonzero(old != values)
+        if len(self._values) != len(user_ids) or len(changed) > LEADERBOARD_REBUILD_FRACTION * len(user_ids):
+            self._rebuild(user_ids, values)
+        else:
+            for i in changed.tolist():
+                self.update(user_ids[i], int(values[i]))
+        self.updated_at = timestamp
+
+    def _rebuild(self, user_ids: list, values: np.ndarray):
+        ids = np.asarray(user_ids, dtype=np.int64)
+        order = np.lexsort((ids, -values))
+        self._values = dict(zip(user_ids, values.tolist()))
+        self._sorted = SortedList(zip((-values[order]).tolist(), ids[order].tolist()))
+
+    def rank(self, user_id: int):
+        """1-based rank, or None for an unknown user."""
+        value = self._values.get(user_id)
+        if value is None:
+            return None
+        return self._sorted.index((-value, user_id)) + 1
+
+    def entries(self, start: int, stop: int) -> list:
+        """[(rank, user_id, cents)] for 0-based positions start..stop-1."""
+        start = max(start, 0)
+        return [
+            (rank, user_id, -neg_value)
+            for rank, (neg_value, user_id) in enumerate(self._sorted.islice(start, stop), start=start + 1)
+        ]
+
+    def top(self, limit: int) -> list:
+        return self.entries(0, limit)
+
+    def around(self, user_id: int, span: int) -> list:
+        """The user's entry with up to ``span`` neighbours on each side."""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        return self.entries(rank - 1 - span, rank + span)
+
+
+leaderboard = Leaderboard()
@@ -3,6 +3,7 @@ import pandas as pd
 from datetime import datetime
 from app.database import SessionLocal
 from app.models import TeamMarketInformation
+from app.money import to_cents
 
 async def load_csv_to_db():
     df = pd.read_csv("team_values_scaled_by_5.csv")
@@ -20,7 +21,7 @@ async def load_csv_to_db():
 
             record = TeamMarketInformation(
                 team_name=row["team_name"],
-                value=float(row["value"]),
+                value_cents=to_cents(row["value"]),
                 timestamp=pd.to_datetime(row["timestamp"]) if "timestamp" in row else datetime.utcnow(),
             )
             session.add(record)
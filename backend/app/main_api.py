@@ -1,8 +1,14 @@
 import asyncio
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, market, trades
-from app.price_updater import update_prices_loop
+from app.api import auth, market, trades, leaderboard
+from app.database import SessionLocal
+from app.price_book import price_book
+from app.baskets import basket_registry
+from app.price_updater import update_prices_loop, follow_prices_loop, RUN_BACKGROUND_JOBS
+from app.retention import retention_loop
+from app.token_store import token_store
+from app.query_stats import track_queries, DB_QUERY_WARN_COUNT
 
 app = FastAPI(title="NFL Stock Trader API")
 
@@ -15,23 +21,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "ETag", "Last-Modified", "X-DB-Queries", "X-DB-Time-Ms"],
 )
 
+# ---------------------------
+# Per-Request DB Instrumentation
+# ---------------------------
+@app.middleware("http")
+async def db_query_stats(request: Request, call_next):
+    """Report how many statements a request ran and how long they took (X-DB-Queries / X-DB-Time-Ms)."""
+    with track_queries() as stats:
+        response = await call_next(request)
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.ms:.1f}"
+    if stats.count > DB_QUERY_WARN_COUNT:
+        print(f"⚠️ {request.method} {request.url.path} ran {stats.count} queries ({stats.ms:.1f} ms in DB)")
+    return response
+
 # ---------------------------
 # Register Routes
 # ---------------------------
 app.include_router(auth.router)
 app.include_router(market.router)
 app.include_router(trades.router)
+app.include_router(leaderboard.router)
 
 # ---------------------------
 # Startup: Background Price Updater
 # ---------------------------
 @app.on_event("startup")
 async def start_price_updater():
-    """Launch background task that randomizes team prices and logs balances."""
-    print("Launching background price updater loop...")
-    asyncio.create_task(update_prices_loop())
+    """Load baskets and warm the latest-price book, then launch the background loops.
+
+    Only the worker with RUN_BACKGROUND_JOBS=true simulates prices and runs
+    retention (one price walk, one set of tick/candle/history rows); every
+    other worker follows its ticks from the database.
+    """
+    async with SessionLocal() as session:
+        await basket_registry.load(session)
+        await price_book.warm(session)
+    if RUN_BACKGROUND_JOBS:
+        print("Launching background price updater loop...")
+        asyncio.create_task(update_prices_loop())
+        asyncio.create_task(retention_loop())
+    else:
+        asyncio.create_task(follow_prices_loop())
+    asyncio.create_task(token_store.sweep_loop())
+    print(f"🔑 Session tokens: '{token_store.name}' store")
 
 # ---------------------------
 # Root Endpoint
@@ -0,0 +1,50 @@
+import asyncio
+import json
+from datetime import datetime
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# ============================================================
+# Market Broadcaster (one serialisation per tick, N subscribers)
+# ============================================================
+class MarketBroadcaster:
+    """Push each tick's price vector to every connected stream client.
+
+    The updater calls ``publish`` once per tick; the payload is serialised
+    once and the same string is handed to every subscriber. Each subscriber
+    has a one-slot queue, so a slow client skips stale ticks instead of
+    buffering them.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self.latest = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, payload: dict):
+        message = json.dumps(payload, default=_json_default, separators=(",", ":"))
+        self.latest = message
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()  # drop the stale tick
+            queue.put_nowait(message)
+
+
+market_broadcaster = MarketBroadcaster()
@@ -0,0 +1,85 @@
+# migrate_cents.py
+import argparse
+import asyncio
+from sqlalchemy import inspect, text
+from app.database import engine
+
+# Float dollar columns replaced by BIGINT cents columns: {table: [(float column, cents column, not null)]}
+MONEY_COLUMNS = {
+    "user": [("balance", "balance_cents", False), ("initial_deposit", "initial_deposit_cents", False)],
+    "trades": [("price", "price_cents", True), ("balance_after_trade", "balance_after_trade_cents", True)],
+    "team_market_information": [("value", "value_cents", True)],
+    "user_positions": [("cost_basis", "cost_basis_cents", True)],
+    "orders": [("limit_price", "limit_price_cents", False), ("stop_price", "stop_price_cents", False),
+               ("fill_price", "fill_price_cents", False)],
+    "portfolio_history": [("balance", "balance_cents", True)],
+    "price_candle": [("open", "open_cents", True), ("high", "high_cents", True),
+                     ("low", "low_cents", True), ("close", "close_cents", True)],
+}
+
+
+def _pending(sync_conn) -> dict:
+    """{table: [(float, cents, not_null, cents_exists)]} for columns whose float version still exists."""
+    inspector = inspect(sync_conn)
+    tables = set(inspector.get_table_names())
+    pending = {}
+    for table, columns in MONEY_COLUMNS.items():
+        if table not in tables:
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        todo = [(f, c, nn) for f, c, nn in columns if f in existing]
+        if todo:
+            pending[table] = [(f, c, nn, c in existing) for f, c, nn in todo]
+    return pending
+
+
+def _id_range(sync_conn, table: str):
+    return sync_conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).one()
+
+
+# ============================================================
+# Migration (add cents column -> backfill in batches -> drop float)
+# ============================================================
+async def migrate(batch_size: int):
+    async with engine.begin() as conn:
+        pending = await conn.run_sync(_pending)
+        quote = conn.dialect.identifier_preparer.quote
+        mysql = conn.dialect.name == "mysql"
+    if not pending:
+        print("✅ All money columns are already integer cents")
+        return
+
+    for table, columns in pending.items():
+        name = quote(table)
+        async with engine.begin() as conn:
+            for _, cents, _, exists in columns:
+                if not exists:
+                    await conn.execute(text(f"ALTER TABLE {name} ADD COLUMN {quote(cents)} BIGINT NULL"))
+            low, high = await conn.run_sync(lambda c: _id_range(c, name))
+
+        # Backfill in bounded id ranges so large tables never hold one huge transaction
+        assignments = ", ".join(f"{quote(cents)} = ROUND({quote(col)} * 100)" for col, cents, _, _ in columns)
+        migrated = 0
+        if low is not None:
+            for start in range(low, high + 1, batch_size):
+                async with engine.begin() as conn:
+                    res = await conn.execute(
+                        text(f"UPDATE {name} SET {assignments} WHERE id >= :lo AND id < :hi"),
+                        {"lo": start, "hi": start + batch_size},
+                    )
+                    migrated += res.rowcount
+
+        async with engine.begin() as conn:
+            for col, cents, not_null, _ in columns:
+                await conn.execute(text(f"ALTER TABLE {name} DROP COLUMN {quote(col)}"))
+                if not_null and mysql:
+                    await conn.execute(text(f"ALTER TABLE {name} MODIFY {quote(cents)} BIGINT NOT NULL"))
+        print(f"💱 {table}: {', '.join(c for _, c, _, _ in columns)} backfilled for {migrated} rows, "
+              f"float columns dropped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert float dollar columns to BIGINT integer cents.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size))
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -10,11 +10,12 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(100), unique=True, nullable=False)
     password = Column(String(255), nullable=False)
-    balance = Column(Float, default=0)
-    initial_deposit = Column(Float, default=0)
+    # Money columns hold integer cents (see app.money)
+    balance_cents = Column(BigInteger, default=0)
+    initial_deposit_cents = Column(BigInteger, default=0)
 
     def __repr__(self):
-        return f"<User(id={self.id}, email='{self.email}', balance={self.balance})>"
+        return f"<User(id={self.id}, email='{self.email}', balance_cents={self.balance_cents})>"
 
 
 class Trades(Base):
@@ -25,33 +26,132 @@ class Trades(Base):
     team_name = Column(String(50), nullable=False)
     action = Column(String(10), nullable=False)  # "buy" or "sell"
     quantity = Column(Integer, nullable=False)
-    balance_after_trade = Column(Float, nullable=False)
-    price = Column(Float, nullable=False)
+    balance_after_trade_cents = Column(BigInteger, nullable=False)
+    price_cents = Column(BigInteger, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f"<Trade(user_id={self.user_id}, {self.action} {self.quantity} {self.team_name} @ {self.price})>"
+        return f"<Trade(user_id={self.user_id}, {self.action} {self.quantity} {self.team_name} @ {self.price_cents}c)>"
 
 
 class TeamMarketInformation(Base):
     __tablename__ = "team_market_information"
+    __table_args__ = (
+        # Serves "latest for team" and "history for team" (filter on name, sort on time)
+        Index("ix_team_market_information_team_timestamp", "team_name", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    team_name = Column(String(50), nullable=False, index=True)
-    value = Column(Float, nullable=False)
+    team_name = Column(String(50), nullable=False)
+    value_cents = Column(BigInteger, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
-        return f"<TeamMarketInformation(team='{self.team_name}', value={self.value}, time={self.timestamp})>"
+        return f"<TeamMarketInformation(team='{self.team_name}', value_cents={self.value_cents}, time={self.timestamp})>"
+
+
+class UserPosition(Base):
+    __tablename__ = "user_positions"
+    __table_args__ = (
+        UniqueConstraint("user_id", "team_name", name="uq_user_position"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    team_name = Column(String(50), nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+    cost_basis_cents = Column(BigInteger, nullable=False, default=0)  # average-cost basis of the open quantity
+    last_txn = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<UserPosition(user_id={self.user_id}, {self.quantity} {self.team_name}, cost={self.cost_basis_cents}c)>"
+
+
+class Order(Base):
+    __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_status", "status"),
+        Index("ix_orders_user_status", "user_id", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    team_name = Column(String(50), nullable=False)
+    action = Column(String(10), nullable=False)  # "buy" or "sell"
+    order_type = Column(String(10), nullable=False)  # "limit", "stop" or "stop_limit"
+    quantity = Column(Integer, nullable=False)
+    limit_price_cents = Column(BigInteger, nullable=True)
+    stop_price_cents = Column(BigInteger, nullable=True)
+    status = Column(String(10), nullable=False, default="open")  # open, filled, cancelled, rejected
+    created_at = Column(DateTime, default=datetime.utcnow)
+    triggered_at = Column(DateTime, nullable=True)  # stop reached (stop-limit orders then rest as limits)
+    filled_at = Column(DateTime, nullable=True)
+    fill_price_cents = Column(BigInteger, nullable=True)
+    message = Column(String(255), nullable=True)
+
+    def __repr__(self):
+        return (f"<Order(id={self.id}, {self.order_type} {self.action} {self.quantity} {self.team_name}, "
+                f"limit={self.limit_price_cents}c, stop={self.stop_price_cents}c, status='{self.status}')>")
 
 
 class PortfolioHistory(Base):
     __tablename__ = "portfolio_history"
+    __table_args__ = (
+        # Serves a user's history in time order and "since cursor" polling
+        Index("ix_portfolio_history_user_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
-    balance = Column(Float, nullable=False)
+    balance_cents = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<PortfolioHistory(user_id={self.user_id}, balance_cents={self.balance_cents}, time={self.timestamp})>"
+
+
+class PriceCandle(Base):
+    __tablename__ = "price_candle"
+    __table_args__ = (
+        UniqueConstraint("team_name", "interval", "bucket_start", name="uq_price_candle_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    team_name = Column(String(50), nullable=False)
+    interval = Column(String(4), nullable=False)  # "1m", "5m", "1h" or "1d"
+    bucket_start = Column(DateTime, nullable=False)
+    open_cents = Column(BigInteger, nullable=False)
+    high_cents = Column(BigInteger, nullable=False)
+    low_cents = Column(BigInteger, nullable=False)
+    close_cents = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return (f"<PriceCandle(team='{self.team_name}', {self.interval} @ {self.bucket_start}, "
+                f"o={self.open_cents}, h={self.high_cents}, l={self.low_cents}, c={self.close_cents})>")
+
+
+class SessionToken(Base):
+    __tablename__ = "session_token"
+
+    token_hash = Column(String(64), primary_key=True)  # SHA-256 of the token, never the token itself
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<SessionToken(user_id={self.user_id}, expires_at={self.expires_at})>"
+
+
+class BasketConstituent(Base):
+    __tablename__ = "basket_constituent"
+    __table_args__ = (
+        UniqueConstraint("basket_name", "team_name", name="uq_basket_constituent"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    basket_name = Column(String(50), nullable=False, index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    team_name = Column(String(50), nullable=False)
+    weight = Column(Float, nullable=False)
 
     def __repr__(self):
-        return f"<PortfolioHistory(user_id={self.user_id}, balance={self.balance}, time={self.timestamp})>"
+        return f"<BasketConstituent(basket='{self.basket_name}', team='{self.team_name}', weight={self.weight})>"
@@ -0,0 +1,44 @@
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+
+# ============================================================
+# Fixed-Point Money (integer cents)
+# ============================================================
+# Every balance, price and cost basis is stored and computed as integer
+# cents. Dollars only appear at the edges: parsing API input and CSVs, and
+# formatting responses and exports.
+CENTS_PER_DOLLAR = 100
+
+
+def to_cents(amount) -> int:
+    """Parse a dollar amount (str, int, float or Decimal) into integer cents, rounding half up."""
+    if isinstance(amount, int):
+        return amount * CENTS_PER_DOLLAR
+    return int((Decimal(str(amount)) * CENTS_PER_DOLLAR).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def to_dollars(cents) -> float:
+    """Cents as a float dollar amount, for charts and exports only."""
+    return cents / CENTS_PER_DOLLAR
+
+
+def format_cents(cents) -> str:
+    """Render cents as a dollar string with two decimals, e.g. 12345 -> "123.45"."""
+    cents = int(cents)
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), CENTS_PER_DOLLAR)
+    return f"{sign}{whole}.{frac:02d}"
+
+
+def round_cents(values) -> np.ndarray:
+    """Round a float array of (fractional) cents to int64 cents."""
+    return np.rint(values).astype(np.int64)
+
+
+def mul_div_cents(cents: int, numerator: int, denominator: int) -> int:
+    """``cents * numerator / denominator`` in integer arithmetic, rounding half away from zero."""
+    product = cents * numerator
+    quotient, remainder = divmod(abs(product), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if product >= 0 else -quotient
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import heapq
+import os
+import random
+import time
+from sqlalchemy import select, update
+from app.database import SessionLocal
+from app.models import Order
+from app.execution import execute_legs, TradeRejected
+
+ORDER_TYPES = ("limit", "stop", "stop_limit")
+# Cap on triggered orders executing at once; each uses its own session
+ORDER_EXECUTION_CONCURRENCY = int(os.getenv("ORDER_EXECUTION_CONCURRENCY", "50"))
+# How often to pick up orders placed through other workers
+ORDER_SYNC_SECONDS = float(os.getenv("ORDER_SYNC_SECONDS", "30"))
+
+
+def trigger_rule(action: str, order_type: str, stage: str):
+    """(trigger price attribute, fires when price "falls" to it or "rises" to it)."""
+    if stage == "stop":
+        # Buy stops chase a breakout upwards; sell stops cut losses on the way down
+        return "stop_cents", "rises" if action == "buy" else "falls"
+    return "limit_cents", "falls" if action == "buy" else "rises"
+
+
+class RestingOrder:
+    """The in-memory copy of an open order (prices in cents); ``stage`` is "stop" until a stop-limit's stop is hit."""
+
+    __slots__ = ("id", "user_id", "team_name", "action", "order_type", "quantity",
+                 "limit_cents", "stop_cents", "stage")
+
+    def __init__(self, id, user_id, team_name, action, order_type, quantity,
+                 limit_cents=None, stop_cents=None, triggered=False):
+        self.id = id
+        self.user_id = user_id
+        self.team_name = team_name
+        self.action = action
+        self.order_type = order_type
+        self.quantity = quantity
+        self.limit_cents = limit_cents
+        self.stop_cents = stop_cents
+        self.stage = "stop" if order_type == "stop" or (order_type == "stop_limit" and not triggered) else "limit"
+
+    @classmethod
+    def from_row(cls, order: Order) -> "RestingOrder":
+        return cls(order.id, order.user_id, order.team_name, order.action, order.order_type, order.quantity,
+                   order.limit_price_cents, order.stop_price_cents, triggered=order.triggered_at is not None)
+
+    @property
+    def trigger(self):
+        return trigger_rule(self.action, self.order_type, self.stage)
+
+
+# ============================================================
+# Trigger Index (two heaps per instrument)
+# ============================================================
+class TriggerIndex:
+    """Open orders keyed by trigger price so a tick only touches orders that fire.
+
+    Each instrument has a max-heap of orders that fire when the price falls
+    to their trigger (buy limits, sell stops) and a min-heap of orders that
+    fire when it rises to theirs (sell limits, buy stops). A tick peeks at
+    the two heap tops and pops only while they are crossed: O(1) for an
+    untouched instrument and O(k log n) for k triggered orders, however
+    many orders rest. Cancellations are lazy; stale heap entries are
+    skipped when popped and swept out once they outnumber live orders.
+    """
+
+    def __init__(self):
+        self._falls = {}
+        self._rises = {}
+        self._live = {}
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._live
+
+    def add(self, order: RestingOrder):
+        self._live[order.id] = order
+        attribute, direction = order.trigger
+        price = getattr(order, attribute)
+        if direction == "falls":
+            heapq.heappush(self._falls.setdefault(order.team_name, []), (-price, order.id, order.stage))
+        else:
+            heapq.heappush(self._rises.setdefault(order.team_name, []), (price, order.id, order.stage))
+
+    def discard(self, order_id: int):
+        if self._live.pop(order_id, None) is not None:
+            self._stale += 1
+            if self._stale > max(len(self._live), 1024):
+                self._compact()
+
+    def _current(self, order_id: int, stage: str):
+        order = self._live.get(order_id)
+        return order if order is not None and order.stage == stage else None
+
+    def _compact(self):
+        for heaps in (self._falls, self._rises):
+            for name, heap in heaps.items():
+                heap[:] = [entry for entry in heap if self._current(entry[1], entry[2]) is not None]
+                heapq.heapify(heap)
+        self._stale = 0
+
+    def pop_triggered(self, prices: dict) -> tuple:
+        """Remove every live order crossed by ``prices`` ({instrument: cents}).
+
+        Returns (fired, restaged). Stop-limit orders whose stop is crossed
+        are re-indexed as limit orders and reported in ``restaged``; they
+        also fire if the same price crosses their limit.
+        """
+        fired, restaged = [], []
+        for name, price in prices.items():
+            falls, rises = self._falls.get(name), self._rises.get(name)
+            while (falls and -falls[0][0] >= price) or (rises and rises[0][0] <= price):
+                heap = falls if falls and -falls[0][0] >= price else rises
+                _, order_id, stage = heapq.heappop(heap)
+                order = self._current(order_id, stage)
+                if order is None:
+                    self._stale = max(self._stale - 1, 0)
+                    continue
+                if order.order_type == "stop_limit" and order.stage == "stop":
+                    order.stage = "limit"
+                    restaged.append(order)
+                    self.add(order)
+                    continue
+                del self._live[order_id]
+                fired.append(order)
+        return fired, restaged
+
+
+# ============================================================
+# Order Book (trigger index + database status)
+# ============================================================
+class OrderBook:
+    """Resting orders for the price updater; triggered orders go through ``execute_legs``."""
+
+    def __init__(self):
+        self.index = TriggerIndex()
+        self.max_id = 0
+        self.synced_at = None
+
+    def add(self, order: Order):
+        self.index.add(RestingOrder.from_row(order))
+        self.max_id = max(self.max_id, order.id)
+
+    def discard(self, order_id: int):
+        self.index.discard(order_id)
+
+    async def load(self, session):
+        """(Re)build the index from every open order."""
+        self.index = TriggerIndex()
+        self.max_id = 0
+        await self.sync(session)
+
+    async def sync(self, session):
+        """Index open orders placed since the last sync (e.g. through another worker)."""
+        res = await session.execute(
+            select(Order).where(Order.status == "open", Order.id > self.max_id).order_by(Order.id.asc())
+        )
+        for order in res.scalars().all():
+            if order.id not in self.index:
+                self.add(order)
+            self.max_id = max(self.max_id, order.id)
+        self.synced_at = time.monotonic()
+
+    def needs_sync(self) -> bool:
+        return self.synced_at is None or time.monotonic() - self.synced_at >= ORDER_SYNC_SECONDS
+
+    async def process_tick(self, prices: dict, now) -> dict:
+        """Fire every order crossed by this tick's prices and execute it at those prices."""
+        fired, restaged = self.index.pop_triggered(prices)
+        counts = {"filled": 0, "rejected": 0, "skipped": 0, "failed": 0, "restaged": len(restaged)}
+        if restaged:
+            try:
+                async with SessionLocal() as session:
+                    await session.execute(
+                        update(Order).where(Order.id.in_([o.id for o in restaged]), Order.status == "open")
+                        .values(triggered_at=now)
+                    )
+                    await session.commit()
+            except Exception as exc:  # the index already holds them as limits; only a reload would lose that
+                print(f"⚠️ Could not record {len(restaged)} restaged stop-limit orders: {exc!r}")
+        if not fired:
+            return counts
+
+        gate = asyncio.Semaphore(ORDER_EXECUTION_CONCURRENCY)
+
+        async def one(order: RestingOrder):
+            async with gate, SessionLocal() as session:
+                try:
+                    # Claim the order in the trade's own transaction so a concurrent cancel wins or loses cleanly
+                    claimed = await session.execute(
+                        update(Order).where(Order.id == order.id, Order.status == "open")
+                        .values(status="filled", triggered_at=now, filled_at=now,
+                                fill_price_cents=prices[order.team_name])
+                    )
+                    if claimed.rowcount != 1:
+                        await session.rollback()
+                        counts["skipped"] += 1
+                        return
+                    leg = {"team_name": order.team_name, "action": order.action, "quantity": order.quantity}
+                    try:
+                        await execute_legs(session, order.user_id, [leg], prices=prices)
+                        counts["filled"] += 1
+                    except TradeRejected as exc:
+                        await session.execute(
+                            update(Order).where(Order.id == order.id, Order.status == "open")
+                            .values(status="rejected", triggered_at=now, message=exc.message[:255])
+                        )
+                        await session.commit()
+                        counts["rejected"] += 1
+                except Exception as exc:
+                    # Nothing was committed, so the claim rolled back and the order is still open in the
+                    # database; re-index it so the next crossing tick retries it
+                    counts["failed"] += 1
+                    print(f"⚠️ Order {order.id} failed to execute, will retry: {exc!r}")
+                    try:
+                        await session.rollback()
+                    except Exception:
+                        pass
+                    self.index.add(order)
+
+        # return_exceptions: one failed fill must never abort the rest of the tick
+        await asyncio.gather(*(one(order) for order in fired), return_exceptions=True)
+        return counts
+
+order_book = OrderBook()
+
+
+# ============================================================
+# Benchmark (in-memory matching only)
+# ============================================================
+def benchmark(orders: int, instruments: int, ticks: int, seed: int):
+    """Time pop_triggered against ``orders`` resting orders on a random walk."""
+    rng = random.Random(seed)
+    names = [f"T{i}" for i in range(instruments)]
+    prices = {name: 10000 for name in names}
+    index = TriggerIndex()
+    started = time.perf_counter()
+    for order_id in range(1, orders + 1):
+        order_type = rng.choice(ORDER_TYPES)
+        stop = round(10000 * rng.uniform(0.8, 1.2))
+        limit = round(stop * rng.uniform(0.98, 1.02))
+        index.add(RestingOrder(order_id, 1, rng.choice(names), rng.choice(("buy", "sell")), order_type,
+                               1, limit if order_type != "stop" else None, stop if order_type != "limit" else None))
+    print(f"📥 Indexed {orders} orders over {instruments} instruments in {time.perf_counter() - started:.2f}s")
+
+    worst, total, fired = 0.0, 0.0, 0
+    for _ in range(ticks):
+        prices = {name: round(p * (1 + rng.gauss(0, 0.01))) for name, p in prices.items()}
+        started = time.perf_counter()
+        fired += len(index.pop_triggered(prices)[0])
+        elapsed = time.perf_counter() - started
+        worst, total = max(worst, elapsed), total + elapsed
+    print(f"⚡ {ticks} ticks: {fired} orders fired, {len(index)} still resting; "
+          f"avg {total / ticks * 1000:.2f} ms, worst {worst * 1000:.2f} ms per tick")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark trigger matching for resting limit/stop orders.")
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--instruments", type=int, default=43)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.orders, args.instruments, args.ticks, args.seed)
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+# ============================================================
+# Password Hashing Config
+# ============================================================
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # cost factor for new hashes; each +1 doubles the time
+# bcrypt releases the GIL while hashing, so threads run in parallel; 0 hashes inline on the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash requests allowed to wait for a worker before new ones are turned away
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes are already queued; the caller should retry later."""
+
+
+# ============================================================
+# Bounded Hashing Pool
+# ============================================================
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a fixed-size thread pool.
+
+    At most ``workers`` hashes run at once and at most ``max_queue`` more
+    wait for a slot; beyond that requests fail fast with PasswordHasherBusy
+    instead of piling up, so a login storm costs bounded memory and never
+    blocks other requests on the worker.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, rounds: int = BCRYPT_ROUNDS,
+                 max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.rounds = rounds
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt") if workers > 0 else None
+        self._slots = asyncio.Semaphore(max(workers, 1))
+        self.waiting = 0
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise PasswordHasherBusy(f"{self.waiting} password hashes already queued")
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.rounds)).decode()
+
+    @staticmethod
+    def _check(password: str, hashed: str) -> bool:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash, password)
+
+    async def check(self, password: str, hashed: str) -> bool:
+        """Verify against a stored hash (its own embedded cost factor applies)."""
+        return await self._run(self._check, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
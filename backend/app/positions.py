@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+from sqlalchemy import select, delete, insert
+from app.database import SessionLocal
+from app.models import Trades, UserPosition
+from app.money import format_cents, mul_div_cents
+
+
+# ============================================================
+# Average-Cost Position Math
+# ============================================================
+def apply_fill(quantity: int, cost: int, action: str, fill_qty: int, price: int):
+    """Return (quantity, cost) after a fill, using the average-cost method.
+
+    All money is integer cents. Buys add ``price * qty`` to the basis; sells
+    remove the average cost of the shares sold, rounded to the cent (the
+    rounding is deterministic, so a replay reproduces it exactly). Sells
+    larger than the holding are ignored, as in the recomputed history.
+    """
+    if action == "buy":
+        return quantity + fill_qty, cost + price * fill_qty
+    if quantity < fill_qty:
+        return quantity, cost
+    remaining = quantity - fill_qty
+    if remaining <= 0:
+        return 0, 0
+    return remaining, cost - mul_div_cents(cost, fill_qty, quantity)
+
+
+def replay_trades(trades) -> dict:
+    """Fold trades (oldest first) into {(user_id, team): [qty, cost, last_txn]}."""
+    positions = {}
+    for t in trades:
+        key = (t.user_id, t.team_name)
+        qty, cost, last_txn = positions.get(key, (0, 0, t.timestamp))
+        qty, cost = apply_fill(qty, cost, t.action, t.quantity, t.price_cents)
+        positions[key] = [qty, cost, max(last_txn, t.timestamp)]
+    return positions
+
+
+# ============================================================
+# Reads + Transactional Updates
+# ============================================================
+async def load_positions(session, user_id: int) -> list:
+    """Open positions for a user, one row per instrument."""
+    res = await session.execute(
+        select(UserPosition)
+        .where(UserPosition.user_id == user_id, UserPosition.quantity > 0)
+        .order_by(UserPosition.id.asc())
+    )
+    return res.scalars().all()
+
+
+async def get_position(session, user_id: int, team_name: str):
+    res = await session.execute(
+        select(UserPosition).where(UserPosition.user_id == user_id, UserPosition.team_name == team_name)
+    )
+    return res.scalar_one_or_none()
+
+
+async def get_positions(session, user_id: int, team_names) -> dict:
+    """{team: UserPosition} for the given instruments, in one query."""
+    res = await session.execute(
+        select(UserPosition).where(UserPosition.user_id == user_id, UserPosition.team_name.in_(list(team_names)))
+    )
+    return {p.team_name: p for p in res.scalars().all()}
+
+
+def fill_position(session, positions: dict, user_id: int, team_name: str, action: str,
+                  quantity: int, price_cents: int, timestamp):
+    """Apply a fill to a preloaded {team: UserPosition} map, creating the row if needed."""
+    position = positions.get(team_name)
+    if position is None:
+        position = UserPosition(user_id=user_id, team_name=team_name, quantity=0, cost_basis_cents=0,
+                                last_txn=timestamp)
+        session.add(position)
+        positions[team_name] = position
+    qty, cost = apply_fill(position.quantity, position.cost_basis_cents, action, quantity, price_cents)
+    position.quantity = qty
+    position.cost_basis_cents = cost
+    position.last_txn = timestamp
+    return position
+
+
+# ============================================================
+# Rebuild / Verify from Trades
+# ============================================================
+async def rebuild_positions(verify_only: bool = False) -> int:
+    """Recompute every position from Trades; return the number of mismatches found."""
+    async with SessionLocal() as session:
+        trades = (await session.execute(
+            select(Trades.user_id, Trades.team_name, Trades.action, Trades.quantity, Trades.price_cents,
+                   Trades.timestamp)
+            .order_by(Trades.timestamp.asc(), Trades.id.asc())
+        )).all()
+        expected = {key: v for key, v in replay_trades(trades).items() if v[0] > 0}
+
+        stored = {
+            (p.user_id, p.team_name): p
+            for p in (await session.execute(select(UserPosition))).scalars().all()
+        }
+        mismatches = 0
+        for key in expected.keys() | {k for k, p in stored.items() if p.quantity > 0}:
+            want, have = expected.get(key), stored.get(key)
+            if want is None or have is None or (want[0], want[1]) != (have.quantity, have.cost_basis_cents):
+                mismatches += 1
+                if verify_only:
+                    print(f"❌ {key}: expected {want and (want[0], format_cents(want[1]))}, "
+                          f"stored {have and (have.quantity, format_cents(have.cost_basis_cents))}")
+
+        if verify_only:
+            print(f"🔎 {len(expected)} open positions checked, {mismatches} mismatches")
+            return mismatches
+
+        await session.execute(delete(UserPosition))
+        if expected:
+            await session.execute(insert(UserPosition), [
+                {"user_id": user_id, "team_name": team, "quantity": qty,
+                 "cost_basis_cents": cost, "last_txn": last_txn}
+                for (user_id, team), (qty, cost, last_txn) in expected.items()
+            ])
+        await session.commit()
+    print(f"📦 Rebuilt {len(expected)} positions from {len(trades)} trades ({mismatches} corrected)")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild user_positions from the Trades ledger.")
+    parser.add_argument("--verify", action="store_true", help="Only compare and report, do not write")
+    args = parser.parse_args()
+    mismatches = asyncio.run(rebuild_positions(verify_only=args.verify))
+    raise SystemExit(1 if args.verify and mismatches else 0)
@@ -0,0 +1,155 @@
+import secrets
+from sqlalchemy import select, func, and_
+from app.models import TeamMarketInformation
+from app.baskets import basket_registry, is_etf
+
+
+def newest_rows_query():
+    """(name, cents, timestamp) of the newest tick per instrument: one grouped MAX join."""
+    newest = (
+        select(
+            TeamMarketInformation.team_name,
+            func.max(TeamMarketInformation.timestamp).label("timestamp"),
+        )
+        .group_by(TeamMarketInformation.team_name)
+        .subquery()
+    )
+    return select(
+        TeamMarketInformation.team_name,
+        TeamMarketInformation.value_cents,
+        TeamMarketInformation.timestamp,
+    ).join(
+        newest,
+        and_(
+            TeamMarketInformation.team_name == newest.c.team_name,
+            TeamMarketInformation.timestamp == newest.c.timestamp,
+        ),
+    )
+
+
+# ============================================================
+# Latest Price Book (in-process, shared by updater + API)
+# ============================================================
+class LatestPriceBook:
+    """Latest (value, timestamp) per instrument, kept in memory; values are integer cents.
+
+    Warmed from the database at startup and updated in place by the price
+    updater on every tick, so read and trade paths resolve prices in O(1).
+    The database is only consulted on a cold miss.
+
+    Every ``update`` is one tick: it bumps ``seq`` and records that sequence
+    number against each instrument whose value changed, so clients can ask
+    for only what moved since the sequence they last saw. ``epoch`` is unique
+    per process so cached sequence numbers from another worker never match.
+    """
+
+    def __init__(self):
+        self._latest = {}
+        self._changed_seq = {}
+        self._removed_seq = {}  # tombstones so /deltas can report delistings
+        self.seq = 0
+        self.epoch = secrets.token_hex(4)
+        self.last_modified = None
+        self.warmed = False
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._latest
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def get(self, name: str):
+        """Return (value, timestamp) for an instrument, or None if unknown."""
+        return self._latest.get(name)
+
+    def snapshot(self) -> dict:
+        """Return a shallow copy of the book: {name: (value, timestamp)}."""
+        return dict(self._latest)
+
+    def update(self, entries):
+        """Apply (name, value, timestamp) triples from a tick."""
+        self.seq += 1
+        for name, value, timestamp in entries:
+            value = int(value)
+            previous = self._latest.get(name)
+            if previous is None or previous[0] != value:
+                self._changed_seq[name] = self.seq
+                self._removed_seq.pop(name, None)
+            self._latest[name] = (value, timestamp)
+            if self.last_modified is None or timestamp > self.last_modified:
+                self.last_modified = timestamp
+
+    def remove(self, name: str):
+        """Drop a delisted instrument from the book, leaving a tombstone for ``removed_since``."""
+        if self._latest.pop(name, None) is not None:
+            self._changed_seq.pop(name, None)
+            self.seq += 1
+            self._removed_seq[name] = self.seq
+
+    def update_baskets(self):
+        """Price every basket from the book's current team prices."""
+        teams = {name: entry for name, entry in self._latest.items() if not is_etf(name)}
+        if not teams:
+            return
+        timestamp = max(ts for _, ts in teams.values())
+        values = basket_registry.evaluate_dict({name: value for name, (value, _) in teams.items()})
+        self.update((name, value, timestamp) for name, value in values.items())
+
+    def changed_since(self, seq: int) -> dict:
+        """Return {name: (value, timestamp)} for instruments changed after ``seq``."""
+        return {
+            name: self._latest[name]
+            for name, changed in self._changed_seq.items()
+            if changed > seq
+        }
+
+    def removed_since(self, seq: int) -> list:
+        """Return the instruments delisted after ``seq``."""
+        return sorted(name for name, removed in self._removed_seq.items() if removed > seq)
+
+    async def warm(self, session):
+        """Load the newest row per instrument from the database."""
+        res = await session.execute(newest_rows_query())
+        rows = [(name, value, ts) for name, value, ts in res.all() if value is not None and not is_etf(name)]
+        self.update(rows)
+        self.update_baskets()
+        self.warmed = True
+        print(f"📒 Price book warmed with {len(self._latest)} instruments")
+
+    async def lookup(self, session, name: str):
+        """Return (value, timestamp), falling back to the database on a cold miss."""
+        hit = self._latest.get(name)
+        if hit is not None:
+            return hit
+
+        basket = basket_registry.get(name)
+        if basket is not None:
+            prices, stamps = {}, []
+            for team in basket.weights:
+                entry = await self.lookup(session, team)
+                if entry is None:
+                    return None
+                prices[team] = entry[0]
+                stamps.append(entry[1])
+            if name not in self._latest:
+                self.update([(name, basket.value_of(prices), max(stamps))])
+            return self._latest[name]
+
+        res = await session.execute(
+            select(TeamMarketInformation.value_cents, TeamMarketInformation.timestamp)
+            .where(TeamMarketInformation.team_name == name)
+            .order_by(TeamMarketInformation.timestamp.desc())
+            .limit(1)
+        )
+        row = res.first()
+        if not row or row.value_cents is None:
+            return None
+        # A tick may have landed while we awaited; never overwrite it
+        if name not in self._latest:
+            self._latest[name] = (int(row.value_cents), row.timestamp)
+            self.seq += 1
+            self._changed_seq[name] = self.seq
+        return self._latest[name]
+
+
+price_book = LatestPriceBook()
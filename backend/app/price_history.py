@@ -0,0 +1,353 @@
+import numpy as np
+from sqlalchemy import select, func, and_, union_all
+from app.models import TeamMarketInformation, PriceCandle
+from app.candles import bucket_start
+from app.baskets import basket_registry
+from app.money import round_cents
+
+# Raw ticks older than the retention window are compacted into candles of
+# this resolution; history reads fall back to them past the oldest raw tick.
+COMPACTED_INTERVAL = "1m"
+
+
+# ============================================================
+# Raw Tick Reads
+# ============================================================
+async def _raw_ticks(session, team_name, start, end, after, before, limit, newest_first) -> list:
+    query = (
+        select(TeamMarketInformation.value_cents, TeamMarketInformation.timestamp)
+        .where(TeamMarketInformation.team_name == team_name)
+    )
+    if start is not None:
+        query = query.where(TeamMarketInformation.timestamp >= start)
+    if end is not None:
+        query = query.where(TeamMarketInformation.timestamp <= end)
+    if after is not None:
+        query = query.where(TeamMarketInformation.timestamp > after)
+    if before is not None:
+        query = query.where(TeamMarketInformation.timestamp < before)
+
+    if newest_first:
+        query = query.order_by(TeamMarketInformation.timestamp.desc())
+    else:
+        query = query.order_by(TeamMarketInformation.timestamp.asc())
+    if limit is not None:
+        query = query.limit(limit)
+    return [tuple(r) for r in (await session.execute(query)).all()]
+
+
+async def _basket_raw_ticks(session, basket, start, end, after, before, limit, newest_first) -> list:
+    """Derive a basket's raw series from its constituents' ticks.
+
+    The first constituent's ticks pick the timestamps (and honour ``limit``);
+    the rest are fetched for that span in one IN query. Timestamps where any
+    constituent is missing are dropped.
+    """
+    teams = sorted(basket.weights)
+    anchor = await _raw_ticks(session, teams[0], start, end, after, before, limit, newest_first)
+    if not anchor:
+        return []
+    stamps = [ts for _, ts in anchor]
+    res = await session.execute(
+        select(TeamMarketInformation.team_name, TeamMarketInformation.value_cents, TeamMarketInformation.timestamp)
+        .where(TeamMarketInformation.team_name.in_(teams),
+               TeamMarketInformation.timestamp >= min(stamps),
+               TeamMarketInformation.timestamp <= max(stamps))
+    )
+    groups = {}
+    for team, value, ts in res.all():
+        if value is not None:
+            groups.setdefault(ts, {})[team] = value
+    points = []
+    for ts in stamps:
+        value = basket.value_of(groups.get(ts, {}))
+        if value is not None:
+            points.append((value, ts))
+    return points
+
+
+async def _instrument_raw_ticks(session, team_name, *args) -> list:
+    basket = basket_registry.get(team_name)
+    if basket is not None:
+        return await _basket_raw_ticks(session, basket, *args)
+    return await _raw_ticks(session, team_name, *args)
+
+
+async def _compacted_ticks(session, team_name, start, end, after, before, limit, newest_first) -> list:
+    query = (
+        select(PriceCandle.close_cents, PriceCandle.bucket_start)
+        .where(PriceCandle.team_name == team_name, PriceCandle.interval == COMPACTED_INTERVAL)
+    )
+    if start is not None:
+        query = query.where(PriceCandle.bucket_start >= start)
+    if end is not None:
+        query = query.where(PriceCandle.bucket_start <= end)
+    if after is not None:
+        query = query.where(PriceCandle.bucket_start > after)
+    if before is not None:
+        query = query.where(PriceCandle.bucket_start < before)
+
+    if newest_first:
+        query = query.order_by(PriceCandle.bucket_start.desc())
+    else:
+        query = query.order_by(PriceCandle.bucket_start.asc())
+    if limit is not None:
+        query = query.limit(limit)
+    return [tuple(r) for r in (await session.execute(query)).all()]
+
+
+async def oldest_raw_timestamp(session, team_name: str):
+    """Return the timestamp of the oldest raw tick still retained, or None."""
+    basket = basket_registry.get(team_name)
+    if basket is not None:
+        team_name = min(basket.weights)
+    return (await session.execute(
+        select(func.min(TeamMarketInformation.timestamp))
+        .where(TeamMarketInformation.team_name == team_name)
+    )).scalar()
+
+
+async def first_timestamp(session, team_name: str):
+    """Return the start of an instrument's history across raw and compacted data."""
+    raw = await oldest_raw_timestamp(session, team_name)
+    compacted = (await session.execute(
+        select(func.min(PriceCandle.bucket_start))
+        .where(PriceCandle.team_name == team_name, PriceCandle.interval == COMPACTED_INTERVAL)
+    )).scalar()
+    return min((ts for ts in (raw, compacted) if ts is not None), default=None)
+
+
+async def earliest_timestamp(session, team_names):
+    """Return the start of the oldest history among several instruments, or None.
+
+    One statement: per-team MIN over raw ticks (baskets via their first
+    constituent, as in ``oldest_raw_timestamp``) and over compacted candles,
+    each grouped by team so the (team_name, timestamp) indexes serve it.
+    """
+    raw_teams = set()
+    for name in team_names:
+        basket = basket_registry.get(name)
+        raw_teams.add(min(basket.weights) if basket is not None else name)
+    per_team = union_all(
+        select(func.min(TeamMarketInformation.timestamp).label("first"))
+        .where(TeamMarketInformation.team_name.in_(raw_teams))
+        .group_by(TeamMarketInformation.team_name),
+        select(func.min(PriceCandle.bucket_start).label("first"))
+        .where(PriceCandle.team_name.in_(set(team_names)), PriceCandle.interval == COMPACTED_INTERVAL)
+        .group_by(PriceCandle.team_name),
+    ).subquery()
+    return (await session.execute(select(func.min(per_team.c.first)))).scalar()
+
+
+def _compacted_bound(horizon, before):
+    """Exclusive upper bound for compacted points: the raw horizon's minute or ``before``."""
+    if horizon is None:
+        return before
+    horizon = bucket_start(horizon, COMPACTED_INTERVAL)
+    return horizon if before is None or horizon < before else before
+
+
+async def load_ticks(session, team_name: str, start=None, end=None,
+                     after=None, before=None, limit=None) -> list:
+    """Return (cents, timestamp) points for one instrument, oldest first.
+
+    Raw ticks are fetched as bare columns through the (team_name, timestamp)
+    index. Anything older than the oldest retained raw tick is served from the
+    compacted 1m candles (close price at bucket start), so callers see one
+    continuous series. ``after``/``before`` are exclusive keyset cursors on
+    ``timestamp``; with ``before`` the newest ``limit`` points are returned.
+    Basket raw points are derived from constituent ticks.
+    """
+    newest_first = before is not None and after is None
+    horizon = await oldest_raw_timestamp(session, team_name)
+    needs_compacted = horizon is None or start is None or start < horizon
+    if after is not None and horizon is not None and after >= horizon:
+        needs_compacted = False
+
+    if newest_first:
+        points = await _instrument_raw_ticks(session, team_name, start, end, after, before, limit, True)
+        remaining = None if limit is None else limit - len(points)
+        if needs_compacted and remaining != 0:
+            older_than = _compacted_bound(horizon, before)
+            points += await _compacted_ticks(
+                session, team_name, start, end, after, older_than, remaining, True
+            )
+        points.reverse()
+        return points
+
+    points = []
+    if needs_compacted:
+        older_than = _compacted_bound(horizon, before)
+        points = await _compacted_ticks(
+            session, team_name, start, end, after, older_than, limit, False
+        )
+    remaining = None if limit is None else limit - len(points)
+    if remaining != 0 and horizon is not None:
+        points += await _instrument_raw_ticks(session, team_name, start, end, after, before, remaining, False)
+    return points
+
+
+def as_of_raw_query(teams, timestamp):
+    """(team, cents) of each team's newest raw tick at or before ``timestamp``: one grouped MAX join."""
+    latest = (
+        select(TeamMarketInformation.team_name, func.max(TeamMarketInformation.timestamp).label("ts"))
+        .where(TeamMarketInformation.team_name.in_(teams), TeamMarketInformation.timestamp <= timestamp)
+        .group_by(TeamMarketInformation.team_name)
+        .subquery()
+    )
+    return (
+        select(TeamMarketInformation.team_name, TeamMarketInformation.value_cents)
+        .join(latest, and_(TeamMarketInformation.team_name == latest.c.team_name,
+                           TeamMarketInformation.timestamp == latest.c.ts))
+    )
+
+
+def as_of_compacted_query(teams, timestamp):
+    """(team, cents) of each team's newest compacted 1m close at or before ``timestamp``."""
+    latest = (
+        select(PriceCandle.team_name, func.max(PriceCandle.bucket_start).label("ts"))
+        .where(PriceCandle.team_name.in_(teams), PriceCandle.interval == COMPACTED_INTERVAL,
+               PriceCandle.bucket_start <= timestamp)
+        .group_by(PriceCandle.team_name)
+        .subquery()
+    )
+    return (
+        select(PriceCandle.team_name, PriceCandle.close_cents)
+        .join(latest, and_(PriceCandle.team_name == latest.c.team_name,
+                           PriceCandle.bucket_start == latest.c.ts))
+        .where(PriceCandle.interval == COMPACTED_INTERVAL)
+    )
+
+
+def raw_horizons_query(teams):
+    """(team, oldest retained raw tick) for many teams in one grouped query."""
+    return (
+        select(TeamMarketInformation.team_name, func.min(TeamMarketInformation.timestamp))
+        .where(TeamMarketInformation.team_name.in_(teams))
+        .group_by(TeamMarketInformation.team_name)
+    )
+
+
+async def _as_of_values(session, teams: list, timestamp) -> dict:
+    """{team: cents} last known at or before ``timestamp`` for many teams at once.
+
+    Raw ticks first, then the compacted 1m closes for teams whose raw ticks
+    start after ``timestamp``.
+    """
+    values = dict((await session.execute(as_of_raw_query(teams, timestamp))).all())
+    missing = [team for team in teams if team not in values]
+    if missing:
+        values.update((await session.execute(as_of_compacted_query(missing, timestamp))).all())
+    return values
+
+
+async def price_at(session, team_name: str, timestamp):
+    """Return the last known price (cents) at or before ``timestamp``, or None."""
+    basket = basket_registry.get(team_name)
+    teams = list(basket.weights) if basket is not None else [team_name]
+    values = await _as_of_values(session, teams, timestamp)
+    if basket is not None:
+        return basket.value_of(values)
+    return values.get(team_name)
+
+
+# ============================================================
+# As-Of Price Index (sorted arrays + binary search)
+# ============================================================
+class AsOfPriceIndex:
+    """In-memory price series for a few instruments, resolved as-of any time.
+
+    Each underlying team is loaded once as sorted numpy arrays (the last
+    price at or before ``start`` plus every point up to ``end``) and basket
+    series are derived from their constituents' arrays, so a load is a
+    fixed handful of queries however many instruments or baskets are asked
+    for. Lookups are ``np.searchsorted``. Prices are cents; the arrays are
+    float only so that gaps can be NaN.
+    """
+
+    def __init__(self):
+        self._series = {}
+
+    @classmethod
+    async def load(cls, session, names, start, end=None) -> "AsOfPriceIndex":
+        index = cls()
+        names = set(names)
+        baskets = {name: basket_registry.get(name) for name in names if name in basket_registry}
+        teams = sorted((names - baskets.keys()).union(*(b.weights for b in baskets.values())))
+        if not teams:
+            return index
+
+        points = {team: [] for team in teams}
+        for team, value in (await _as_of_values(session, teams, start)).items():
+            points[team].append((start, value))
+
+        if end is None or end > start:
+            horizons = dict((await session.execute(raw_horizons_query(teams))).all())
+
+            # Before a team's raw horizon its history is the compacted 1m closes
+            compacted = [team for team in teams if horizons.get(team) is None or horizons[team] > start]
+            if compacted:
+                query = (
+                    select(PriceCandle.team_name, PriceCandle.bucket_start, PriceCandle.close_cents)
+                    .where(PriceCandle.team_name.in_(compacted), PriceCandle.interval == COMPACTED_INTERVAL,
+                           PriceCandle.bucket_start > start)
+                    .order_by(PriceCandle.team_name, PriceCandle.bucket_start)
+                )
+                if end is not None:
+                    query = query.where(PriceCandle.bucket_start <= end)
+                for team, ts, value in (await session.execute(query)).all():
+                    if horizons.get(team) is None or ts < bucket_start(horizons[team], COMPACTED_INTERVAL):
+                        points[team].append((ts, value))
+
+            raw = [team for team in teams if horizons.get(team) is not None and (end is None or horizons[team] <= end)]
+            if raw:
+                query = (
+                    select(TeamMarketInformation.team_name, TeamMarketInformation.timestamp,
+                           TeamMarketInformation.value_cents)
+                    .where(TeamMarketInformation.team_name.in_(raw), TeamMarketInformation.timestamp > start)
+                    .order_by(TeamMarketInformation.team_name, TeamMarketInformation.timestamp)
+                )
+                if end is not None:
+                    query = query.where(TeamMarketInformation.timestamp <= end)
+                for team, ts, value in (await session.execute(query)).all():
+                    points[team].append((ts, value))
+
+        for team, series in points.items():
+            index._series[team] = (
+                np.array([ts for ts, _ in series], dtype="datetime64[us]"),
+                np.array([value for _, value in series], dtype=float),
+            )
+        for name, basket in baskets.items():
+            index._series[name] = index._derive_basket(basket)
+        return index
+
+    def _derive_basket(self, basket) -> tuple:
+        """A basket's series at every constituent tick: sum(weight * as-of price), rounded to cents.
+
+        Points where any constituent has no price yet are dropped.
+        """
+        constituents = list(basket.weights)
+        stamps = np.unique(np.concatenate([self._series[team][0] for team in constituents]))
+        matrix = np.vstack([self.values_at(team, stamps) for team in constituents])
+        values = np.array([basket.weights[team] for team in constituents]) @ matrix
+        known = np.isfinite(values)
+        return stamps[known], round_cents(values[known]).astype(float)
+
+    def values_at(self, name: str, timestamps) -> np.ndarray:
+        """Last known price of ``name`` at each timestamp (NaN before the first point)."""
+        stamps = np.asarray(timestamps, dtype="datetime64[us]")
+        series = self._series.get(name)
+        if series is None or not len(series[0]):
+            return np.full(stamps.shape, np.nan)
+        times, values = series
+        positions = np.searchsorted(times, stamps, side="right") - 1
+        return np.where(positions >= 0, values[np.maximum(positions, 0)], np.nan)
+
+    def price_at(self, name: str, timestamp):
+        """Scalar form of ``values_at`` in integer cents; None when no price is known yet."""
+        value = self.values_at(name, [timestamp])[0]
+        return None if np.isnan(value) else int(value)
+
+    def value_at(self, holdings: dict, timestamp) -> int:
+        """Market value in cents of {name: quantity} at ``timestamp`` (unknown prices count as 0)."""
+        return sum(q * (self.price_at(name, timestamp) or 0) for name, q in holdings.items() if q > 0)
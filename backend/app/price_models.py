@@ -0,0 +1,185 @@
+import abc
+import argparse
+import time
+import numpy as np
+
+
+MIN_PRICE = 0.01
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+def _per_instrument(value, n: int) -> np.ndarray:
+    """Broadcast a scalar or sequence parameter to one float per instrument."""
+    return np.broadcast_to(np.asarray(value, dtype=float), (n,)).copy()
+
+
+# ============================================================
+# Price Model Interface
+# ============================================================
+class PriceModel(abc.ABC):
+    """Advance every instrument's price by one tick in a single NumPy step.
+
+    Instruments are positional: ``anchors[i]`` and every per-instrument
+    parameter array describe the same instrument as ``prices[i]``. Model
+    parameters are rates per unit of time, not per tick; ``dt`` is the tick
+    length in seconds, so changing the tick rate keeps the same dynamics.
+    """
+
+    name = "base"
+
+    def __init__(self, anchors, seed=None, dt=5.0):
+        if dt <= 0:
+            raise ValueError(f"Tick length must be positive, got dt={dt}")
+        self.anchors = np.asarray(anchors, dtype=float).copy()
+        self.anchors[self.anchors <= 0] = 1.0
+        self.rng = np.random.default_rng(seed)
+        self.dt = float(dt)
+
+    @property
+    def size(self) -> int:
+        return self.anchors.shape[0]
+
+    @abc.abstractmethod
+    def step(self, prices: np.ndarray) -> np.ndarray:
+        """Return the prices ``dt`` seconds after ``prices``."""
+
+
+# ============================================================
+# Bounded Mean Reversion (original randomize_value model)
+# ============================================================
+class BoundedMeanReversionModel(PriceModel):
+    """Mean-reverting, bounded random walk with stable long-term behavior.
+
+    ``strength`` is the reversion rate per second and the volatilities are
+    per square-root second; the defaults reproduce the original per-tick
+    walk at 5s ticks.
+    """
+
+    name = "bounded"
+
+    def __init__(self, anchors, seed=None, dt=5.0, strength=0.016, volatility=0.0157,
+                 min_volatility=0.0045, lower=0.25, upper=1.75):
+        super().__init__(anchors, seed, dt)
+        n = self.size
+        self.strength = _per_instrument(strength, n) * self.dt
+        self.volatility = _per_instrument(volatility, n) * np.sqrt(self.dt)
+        self.min_volatility = _per_instrument(min_volatility, n) * np.sqrt(self.dt)
+        self.lower = _per_instrument(lower, n)
+        self.upper = _per_instrument(upper, n)
+        self._floor = self.lower * self.anchors
+        self._ceiling = self.upper * self.anchors
+
+    def step(self, prices: np.ndarray) -> np.ndarray:
+        # Deviation from the equilibrium anchor
+        deviation = (prices - self.anchors) / self.anchors
+        volatility = np.maximum(self.min_volatility, self.volatility * (1 - np.abs(deviation)))
+        delta = -self.strength * deviation + volatility * (2 * self.rng.random(self.size) - 1)
+        # Keep within the band around the anchor (±75% by default)
+        return np.minimum(np.maximum(prices * (1 + delta), self._floor), self._ceiling)
+
+
+# ============================================================
+# Ornstein-Uhlenbeck
+# ============================================================
+class OrnsteinUhlenbeckModel(PriceModel):
+    """Exact OU transition toward the anchor over ``dt`` seconds.
+
+    ``theta`` is the reversion rate per second (half-life ln 2 / theta) and
+    ``sigma`` the volatility per square-root second relative to the anchor,
+    so prices settle around the anchor with standard deviation
+    ``sigma / sqrt(2 * theta)`` (about 6% by default) however long it runs.
+    """
+
+    name = "ou"
+
+    def __init__(self, anchors, seed=None, dt=5.0, theta=0.01, sigma=0.009):
+        super().__init__(anchors, seed, dt)
+        n = self.size
+        self.theta = _per_instrument(theta, n)
+        self.sigma = _per_instrument(sigma, n) * self.anchors
+        self._decay = np.exp(-self.theta * self.dt)
+        self._noise = self.sigma * np.sqrt((1 - np.exp(-2 * self.theta * self.dt)) / (2 * self.theta))
+
+    def step(self, prices: np.ndarray) -> np.ndarray:
+        shock = self.rng.standard_normal(self.size)
+        new_prices = self.anchors + (prices - self.anchors) * self._decay + self._noise * shock
+        return np.maximum(new_prices, MIN_PRICE)
+
+
+# ============================================================
+# Geometric Brownian Motion
+# ============================================================
+class GeometricBrownianMotionModel(PriceModel):
+    """Log-normal random walk with annualised drift ``mu`` and volatility ``sigma``.
+
+    GBM has no anchor, so it wanders without bound in the long run; the
+    default 40%/year volatility keeps a 30-day path within roughly ±35%.
+    """
+
+    name = "gbm"
+
+    def __init__(self, anchors, seed=None, dt=5.0, mu=0.0, sigma=0.4):
+        super().__init__(anchors, seed, dt)
+        n = self.size
+        years = self.dt / SECONDS_PER_YEAR
+        self.mu = _per_instrument(mu, n)
+        self.sigma = _per_instrument(sigma, n)
+        self._drift = (self.mu - 0.5 * self.sigma ** 2) * years
+        self._shock_scale = self.sigma * np.sqrt(years)
+
+    def step(self, prices: np.ndarray) -> np.ndarray:
+        shock = self.rng.standard_normal(self.size)
+        return np.maximum(prices * np.exp(self._drift + self._shock_scale * shock), MIN_PRICE)
+
+
+PRICE_MODELS = {
+    model.name: model
+    for model in (BoundedMeanReversionModel, OrnsteinUhlenbeckModel, GeometricBrownianMotionModel)
+}
+
+
+def make_price_model(name: str, anchors, seed=None, dt=5.0, **params) -> PriceModel:
+    """Build a registered price model by name (``bounded``, ``ou`` or ``gbm``) ticking every ``dt`` seconds."""
+    try:
+        model_cls = PRICE_MODELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown price model '{name}' (choose from {sorted(PRICE_MODELS)})")
+    return model_cls(anchors, seed=seed, dt=dt, **params)
+
+
+# ============================================================
+# Offline Simulation
+# ============================================================
+def simulate(model: PriceModel, prices, n_ticks: int, record_every: int = 1) -> np.ndarray:
+    """Run ``n_ticks`` steps and return every ``record_every``-th price vector."""
+    prices = np.asarray(prices, dtype=float)
+    path = np.empty((n_ticks // record_every, model.size))
+    for tick in range(1, n_ticks + 1):
+        prices = np.round(model.step(prices), 2)
+        if tick % record_every == 0:
+            path[tick // record_every - 1] = prices
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate price ticks offline for capacity testing.")
+    parser.add_argument("--model", default="bounded", choices=sorted(PRICE_MODELS))
+    parser.add_argument("--instruments", type=int, default=40)
+    parser.add_argument("--dt", type=float, default=5.0, help="Tick length (seconds)")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    anchors = np.random.default_rng(args.seed).uniform(10, 500, args.instruments).round(2)
+    model = make_price_model(args.model, anchors, seed=args.seed, dt=args.dt)
+    ticks = int(args.days * 86400 / args.dt)
+    record_every = max(int(3600 / args.dt), 1)  # one sample per hour
+
+    started = time.perf_counter()
+    path = simulate(model, anchors, ticks, record_every)
+    elapsed = time.perf_counter() - started
+    ratio = path / anchors  # relative to each instrument's anchor
+    print(
+        f"🧪 {args.model}: {ticks:,} ticks x {args.instruments} instruments in {elapsed:.2f}s "
+        f"(final mean {ratio[-1].mean():.2f}x anchor, min {ratio.min():.2f}x, max {ratio.max():.2f}x)"
+    )
@@ -1,193 +1,205 @@
 import asyncio
-import random
+import os
+import time
 from datetime import datetime
-from decimal import Decimal
-from sqlalchemy import select, func
+import numpy as np
+from sqlalchemy import insert, select
 from app.database import SessionLocal
-from app.models import User, Trades, TeamMarketInformation, PortfolioHistory
+from app.models import TeamMarketInformation, PriceCandle
+from app.price_book import price_book
+from app.baskets import basket_registry, is_etf
+from app.candles import candle_aggregator
+from app.market_stream import market_broadcaster
+from app.price_models import make_price_model
+from app.valuation import valuation_engine
+from app.orders import order_book
+from app.leaderboard import leaderboard
+from app.money import CENTS_PER_DOLLAR, format_cents, round_cents
+from app.query_stats import track_queries, DB_QUERY_WARN_COUNT
 
 # ============================================================
-# Division ETF Mapping (use your city names exactly)
+# Price Simulation Config
 # ============================================================
-DIVISION_MAP = {
-    "AFC North": ["Baltimore", "Cincinnati", "Cleveland", "Pittsburgh"],
-    "AFC South": ["Houston", "Indianapolis", "Jacksonville", "Tennessee"],
-    "AFC East": ["Buffalo", "Miami", "New England", "New York J"],
-    "AFC West": ["Denver", "Kansas City", "Las Vegas", "Los Angeles C"],
-    "NFC North": ["Chicago", "Detroit", "Green Bay", "Minnesota"],
-    "NFC South": ["Atlanta", "Carolina", "New Orleans", "Tampa Bay"],
-    "NFC East": ["Dallas", "New York G", "Philadelphia", "Washington"],
-    "NFC West": ["Arizona", "Los Angeles R", "San Francisco", "Seattle"],
-}
-
-# ============================================================
-# Random Price Fluctuation (Mean-Reverting, No Drift)
-# ============================================================
-def randomize_value(curr_value: float, init_value: float) -> float:
-    """Return a mean-reverting, bounded random price with stable long-term behavior."""
-    if init_value <= 0:
-        init_value = curr_value or 1.0
-
-    # Deviation from the equilibrium anchor
-    deviation = (curr_value - init_value) / init_value
-
-    mean_reversion_strength = 0.08   # slightly softer reversion
-    volatility = 0.035 * (1 - abs(deviation))
-    volatility = max(0.01, volatility)
-
-    delta_factor = -mean_reversion_strength * deviation + random.uniform(-volatility, volatility)
-    new_value = curr_value * (1 + delta_factor)
-
-    # Keep within ±75% of the initial anchor
-    new_value = max(0.25 * init_value, min(new_value, 1.75 * init_value))
-    return round(new_value, 2)
+PRICE_MODEL = os.getenv("PRICE_MODEL", "bounded")
+PRICE_MODEL_SEED = int(os.getenv("PRICE_MODEL_SEED")) if os.getenv("PRICE_MODEL_SEED") else None
+PRICE_TICK_SECONDS = float(os.getenv("PRICE_TICK_SECONDS", "5"))
+BASKET_RELOAD_SECONDS = float(os.getenv("BASKET_RELOAD_SECONDS", "60"))
+# Exactly one worker may simulate prices and run retention; every other worker follows its ticks
+RUN_BACKGROUND_JOBS = os.getenv("RUN_BACKGROUND_JOBS", "true").lower() == "true"
 
 
 # ============================================================
 # Portfolio Balance Recorder
 # ============================================================
-async def record_portfolio_balances(session):
-    """Recalculate and log total portfolio balance for every user."""
-    users = (await session.execute(select(User))).scalars().all()
-
-    for user in users:
-        total_value = Decimal(str(user.balance))
-
-        trades = (await session.execute(
-            select(Trades).where(Trades.user_id == user.id)
-        )).scalars().all()
-
-        holdings = {}
-        for t in trades:
-            holdings[t.team_name] = holdings.get(t.team_name, 0)
-            holdings[t.team_name] += t.quantity if t.action == "buy" else -t.quantity
-
-        for team, qty in holdings.items():
-            if qty <= 0:
-                continue
-            price_row = await session.execute(
-                select(TeamMarketInformation.value)
-                .where(TeamMarketInformation.team_name == team)
-                .order_by(TeamMarketInformation.timestamp.desc())
-                .limit(1)
-            )
-            price = price_row.scalar_one_or_none()
-            if price:
-                total_value += Decimal(str(price)) * qty
-
-        session.add(PortfolioHistory(
-            user_id=user.id,
-            balance=float(total_value),
-            timestamp=datetime.utcnow()
-        ))
-
+async def record_portfolio_balances(session, prices: dict, now: datetime):
+    """Value every user's portfolio in one vectorised step, log it in one insert, and re-rank."""
+    started = time.perf_counter()
+    if valuation_engine.needs_resync():
+        await valuation_engine.load(session)
+    values = await valuation_engine.record(session, prices, now)
     await session.commit()
-    print(f"💰 Recorded balances for {len(users)} users @ {datetime.utcnow():%H:%M:%S}")
+    leaderboard.sync(valuation_engine.user_ids, values, now)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"💰 Recorded and ranked balances for {len(values)} users @ {now:%H:%M:%S} in {elapsed_ms:.1f} ms")
 
 
 # ============================================================
-# ETF Computation Helper
+# Stream Payload
 # ============================================================
-async def compute_etf_values(session):
-    """Compute each division ETF as the average of its member team prices."""
-    now = datetime.utcnow()
-    etf_entries = []
-
-    res = await session.execute(
-        select(TeamMarketInformation.team_name, func.max(TeamMarketInformation.timestamp))
-        .group_by(TeamMarketInformation.team_name)
-    )
-    latest_times = {team: ts for team, ts in res.all()}
-
-    latest_prices = {}
-    for team, ts in latest_times.items():
-        val_row = await session.execute(
-            select(TeamMarketInformation.value)
-            .where(TeamMarketInformation.team_name == team)
-            .order_by(TeamMarketInformation.timestamp.desc())
-            .limit(1)
-        )
-        val = val_row.scalar_one_or_none()
-        if val is not None:
-            latest_prices[team] = float(val)
-
-    for division, members in DIVISION_MAP.items():
-        prices = [latest_prices[m] for m in members if m in latest_prices]
-        if len(prices) == len(members):
-            avg_val = round(sum(prices) / len(prices), 2)
-            etf_entries.append(TeamMarketInformation(
-                team_name=division,
-                value=avg_val,
-                timestamp=now
-            ))
-        else:
-            missing = [m for m in members if m not in latest_prices]
-            print(f"⚠️ Missing prices for {division}: {missing}")
-
-    session.add_all(etf_entries)
-    await session.commit()
-    print(f"📊 Computed {len(etf_entries)} division ETFs @ {now:%H:%M:%S}")
+def market_snapshot(rows: list, now: datetime, seq: int) -> dict:
+    """Shape a tick like /market/all-teams so stream clients can reuse its parser."""
+    teams, etfs = [], []
+    for r in sorted(rows, key=lambda r: r["team_name"]):
+        etf = is_etf(r["team_name"])
+        (etfs if etf else teams).append({
+            "team_name": r["team_name"],
+            "value": format_cents(r["value_cents"]),
+            "timestamp": now,
+            "type": "ETF" if etf else "Team",
+        })
+    return {"seq": seq, "timestamp": now, "teams": teams, "etfs": etfs}
 
 
 # ============================================================
-# Price Updater Loop (Fixed Anchor Logic)
+# Price Updater Loop
 # ============================================================
 async def update_prices_loop():
-    """Continuously randomize team prices, compute ETFs, and log balances every 5 seconds."""
-    print("🏈 Starting price updater loop (with division ETFs)...")
+    """Continuously advance team prices, price baskets, fire resting orders, and log balances every tick.
+
+    Current prices live in memory; a tick never reads price history back from
+    the database. Each tick writes its rows with one bulk insert in a
+    short-lived session so tick cost stays flat with uptime. Basket ETFs are
+    priced from the team vector in memory and only persisted as candles.
+    """
+    print("🏈 Starting price updater loop (with basket ETFs)...")
     async with SessionLocal() as session:
-        # ✅ Use most recent prices as stable anchors (not min values)
-        res_init = await session.execute(
-            select(TeamMarketInformation.team_name, TeamMarketInformation.value)
-            .order_by(TeamMarketInformation.timestamp.desc())
-        )
-        initial_prices = {}
-        for rec in res_init.scalars().all():
-            # Because .scalars() gives only values, we fetch again properly
-            break  # fallback fix below
-
-        # Correct fetch for both name and value
-        res_latest = await session.execute(
-            select(TeamMarketInformation.team_name, TeamMarketInformation.value)
-            .order_by(TeamMarketInformation.timestamp.desc())
+        await basket_registry.load(session)
+        if not price_book.warmed:
+            await price_book.warm(session)
+        await order_book.load(session)
+        latest = price_book.snapshot()
+        await candle_aggregator.warm(
+            session, {name: value for name, (value, _) in latest.items()}, datetime.utcnow()
         )
-        rows = res_latest.all()
-        for team, value in rows:
-            if team not in initial_prices:
-                initial_prices[team] = float(value)
-
-        while True:
-            res = await session.execute(
-                select(TeamMarketInformation)
-                .order_by(TeamMarketInformation.timestamp.desc())
-            )
-            latest_records = res.scalars().all()
-
-            teams_seen = set()
-            new_entries = []
+    baskets_loaded_at = time.monotonic()
+
+    # ✅ Most recent prices are both the starting state and the stable anchors
+    # (the model walks in dollars; every emitted tick is whole cents)
+    teams = sorted(team for team in latest if not is_etf(team))
+    prices = np.array([latest[team][0] for team in teams], dtype=float) / CENTS_PER_DOLLAR
+    model = make_price_model(PRICE_MODEL, prices, seed=PRICE_MODEL_SEED, dt=PRICE_TICK_SECONDS)
+    print(f"🎲 Simulating {len(teams)} teams with '{model.name}' model")
+
+    while True:
+        try:
+            started = time.perf_counter()
             now = datetime.utcnow()
 
-            for rec in latest_records:
-                if rec.team_name in teams_seen:
-                    continue
-                teams_seen.add(rec.team_name)
-
-                init_val = initial_prices.get(rec.team_name, rec.value)
-                new_val = randomize_value(float(rec.value), init_val)
-
-                new_entries.append(TeamMarketInformation(
-                    team_name=rec.team_name,
-                    value=new_val,
-                    timestamp=now
-                ))
+            if time.monotonic() - baskets_loaded_at >= BASKET_RELOAD_SECONDS:
+                # Pick up custom baskets created through other workers
+                async with SessionLocal() as session:
+                    await basket_registry.load(session)
+                baskets_loaded_at = time.monotonic()
+            if order_book.needs_sync():
+                async with SessionLocal() as session:
+                    await order_book.sync(session)
+
+            prices = np.round(model.step(prices), 2)
+            cents = round_cents(prices * CENTS_PER_DOLLAR)
+            etf_names, etf_values = basket_registry.evaluate(teams, cents)
+
+            # Only team ticks are persisted; basket prices are derived from them
+            team_rows = [
+                {"team_name": team, "value_cents": value, "timestamp": now}
+                for team, value in zip(teams, cents.tolist())
+            ]
+            etf_rows = [
+                {"team_name": name, "value_cents": value, "timestamp": now}
+                for name, value in zip(etf_names, etf_values.tolist())
+            ]
+            rows = team_rows + etf_rows
+            tick_prices = {r["team_name"]: r["value_cents"] for r in rows}
+            closed_candles = candle_aggregator.add_tick(tick_prices, now)
+
+            with track_queries() as db_stats:
+                async with SessionLocal() as session:
+                    if team_rows:
+                        await session.execute(insert(TeamMarketInformation), team_rows)
+                    if closed_candles:
+                        await session.execute(insert(PriceCandle), closed_candles)
+                    await session.commit()
+                    price_book.update((r["team_name"], r["value_cents"], now) for r in rows)
+                    market_broadcaster.publish(market_snapshot(rows, now, price_book.seq))
+                    orders = await order_book.process_tick(tick_prices, now)
+                    await record_portfolio_balances(session, tick_prices, now)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(
+                f"✅ Tick @ {now:%H:%M:%S}: {len(team_rows)} teams + {len(closed_candles)} candles "
+                f"written, {len(etf_rows)} ETFs derived, {orders['filled']} orders filled "
+                f"({len(order_book.index)} resting) in {elapsed_ms:.1f} ms, "
+                f"{db_stats.count} queries ({db_stats.ms:.1f} ms in DB)"
+            )
+            if db_stats.count > DB_QUERY_WARN_COUNT:
+                print(f"⚠️ Tick ran {db_stats.count} queries ({db_stats.ms:.1f} ms in DB)")
+        except Exception as exc:  # keep the loop alive; the session context rolled back this tick's writes
+            # Candles closed by a failed tick are rebuilt from the stored raw ticks when retention compacts them
+            print(f"⚠️ Price tick failed, retrying next tick: {exc!r}")
+        await asyncio.sleep(PRICE_TICK_SECONDS)
 
-            session.add_all(new_entries)
-            await session.commit()
-            print(f"✅ Updated {len(new_entries)} teams @ {now:%H:%M:%S}")
 
-            await compute_etf_values(session)
-            await record_portfolio_balances(session)
-            await asyncio.sleep(5)
+# ============================================================
+# Follower Loop (workers with RUN_BACKGROUND_JOBS=false)
+# ============================================================
+async def follow_prices_loop():
+    """Mirror the leader's ticks into this worker's in-memory state without writing anything.
+
+    Polls for team ticks newer than the price book, then per tick re-prices
+    baskets, updates the price book, live candles and stream subscribers,
+    and re-ranks the leaderboard from this worker's valuation engine. Orders,
+    candles and portfolio history are only ever written by the leader.
+    """
+    print("👀 Following price ticks written by the background-jobs worker...")
+    baskets_loaded_at = None
+    while True:
+        try:
+            if baskets_loaded_at is None or time.monotonic() - baskets_loaded_at >= BASKET_RELOAD_SECONDS:
+                async with SessionLocal() as session:
+                    await basket_registry.load(session)
+                    if baskets_loaded_at is None:
+                        if not price_book.warmed:
+                            await price_book.warm(session)
+                        latest = {name: value for name, (value, _) in price_book.snapshot().items()}
+                        await candle_aggregator.warm(session, latest, datetime.utcnow())
+                baskets_loaded_at = time.monotonic()
+
+            async with SessionLocal() as session:
+                query = (
+                    select(TeamMarketInformation.team_name, TeamMarketInformation.value_cents,
+                           TeamMarketInformation.timestamp)
+                    .order_by(TeamMarketInformation.timestamp.asc())
+                )
+                if price_book.last_modified is not None:
+                    query = query.where(TeamMarketInformation.timestamp > price_book.last_modified)
+                ticks = {}
+                for team, value, ts in (await session.execute(query)).all():
+                    if value is not None and not is_etf(team):
+                        ticks.setdefault(ts, {})[team] = value
+                if valuation_engine.needs_resync():
+                    await valuation_engine.load(session)
+
+            for now, team_prices in ticks.items():
+                tick_prices = {**team_prices, **basket_registry.evaluate_dict(team_prices)}
+                rows = [{"team_name": name, "value_cents": value} for name, value in tick_prices.items()]
+                price_book.update((name, value, now) for name, value in tick_prices.items())
+                candle_aggregator.add_tick(tick_prices, now)  # closed candles are the leader's to persist
+                market_broadcaster.publish(market_snapshot(rows, now, price_book.seq))
+            if ticks:
+                prices = {name: value for name, (value, _) in price_book.snapshot().items()}
+                leaderboard.sync(valuation_engine.user_ids, valuation_engine.values(prices), max(ticks))
+        except Exception as exc:  # keep following; the next poll catches up
+            print(f"⚠️ Following price ticks failed: {exc!r}")
+        await asyncio.sleep(PRICE_TICK_SECONDS)
 
 
 # ============================================================
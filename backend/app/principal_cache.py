@@ -0,0 +1,95 @@
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+# ============================================================
+# Principal Cache Config
+# ============================================================
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Bounds how long a revoked/expired token or a balance changed by another worker can be served
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+
+class Principal(NamedTuple):
+    """The authenticated caller: just the columns handlers read, not an ORM row."""
+    id: int
+    email: str
+    balance_cents: int
+
+
+# ============================================================
+# Token -> Principal TTL/LRU Cache
+# ============================================================
+class PrincipalCache:
+    """LRU of token -> Principal with a per-entry TTL.
+
+    A hit skips both the token store and the user lookup. Entries are also
+    indexed by user id so a trade can drop every token of that user the
+    moment its balance changes. Invalidation is per process; other workers
+    converge within the TTL.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (principal, expires_at)
+        self._tokens_by_user = {}
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str):
+        """The cached principal for ``token``, or None (counted as a miss)."""
+        entry = self._entries.get(token)
+        if entry is not None:
+            principal, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return principal
+            self._remove(token)
+        self.misses += 1
+        return None
+
+    def put(self, token: str, principal: Principal):
+        if self.max_size <= 0:
+            return
+        if token in self._entries:
+            self._remove(token)
+        self._entries[token] = (principal, time.monotonic() + self.ttl)
+        self._tokens_by_user.setdefault(principal.id, set()).add(token)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Forget every cached token of a user, e.g. after a trade changed their balance."""
+        for token in self._tokens_by_user.pop(user_id, ()):
+            self._entries.pop(token, None)
+            self.invalidations += 1
+
+    def _remove(self, token: str):
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache()
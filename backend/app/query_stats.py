@@ -0,0 +1,107 @@
+import hashlib
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from app.database import engine
+
+# ============================================================
+# SQL Instrumentation Config
+# ============================================================
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))  # log statements slower than this; <= 0 disables
+DB_QUERY_WARN_COUNT = int(os.getenv("DB_QUERY_WARN_COUNT", "50"))  # flag requests/ticks issuing more queries
+
+
+class QueryStats:
+    """Statements executed and time spent in the database for one request or tick."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def ms(self) -> float:
+        return self.seconds * 1000
+
+
+_current = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    """Count every statement run in this context (including tasks it spawns) into a fresh QueryStats."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+# ============================================================
+# Statement Fingerprints
+# ============================================================
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise a statement so every execution of the same query shape maps to one string.
+
+    Literals become ``?`` and parameter lists of any length (``IN (...)``,
+    multi-row ``VALUES``) collapse to one, so an N+1 loop shows up as the
+    same fingerprint many times instead of N distinct statements.
+    """
+    text = _STRING.sub("?", statement)
+    text = _NUMBER.sub("?", text)
+    text = _PARAM_LIST.sub("(?)", text)
+    text = _VALUES_LIST.sub(r"\1", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+# Slow statements seen so far: {fingerprint: [count, total seconds, max seconds]}
+slow_queries = {}
+
+
+def _record_slow(statement: str, elapsed: float):
+    fp = fingerprint(statement)
+    entry = slow_queries.setdefault(fp, [0, 0.0, 0.0])
+    entry[0] += 1
+    entry[1] += elapsed
+    entry[2] = max(entry[2], elapsed)
+    digest = hashlib.sha1(fp.encode()).hexdigest()[:8]
+    print(f"🐢 Slow query {elapsed * 1000:.1f} ms [{digest}, seen {entry[0]}x, max {entry[2] * 1000:.1f} ms]: {fp[:300]}")
+
+
+# ============================================================
+# Engine Hooks
+# ============================================================
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if 0 < DB_SLOW_QUERY_MS <= elapsed * 1000:
+        _record_slow(statement, elapsed)
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
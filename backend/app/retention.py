@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from app.database import SessionLocal
+from app.models import TeamMarketInformation
+from app.candles import backfill_candles, bucket_start
+
+# ============================================================
+# Retention Config
+# ============================================================
+# Raw ticks are kept for this many hours (0 disables pruning). Must stay above
+# 24h so the updater can seed today's open 1d candles from raw ticks.
+RAW_TICK_RETENTION_HOURS = float(os.getenv("RAW_TICK_RETENTION_HOURS", "48"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+RETENTION_BATCH_PAUSE_SECONDS = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.2"))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+
+
+def retention_cutoff(now: datetime) -> datetime:
+    """Raw ticks strictly older than this are compacted and deleted.
+
+    Aligned to a day boundary so whole 1m/5m/1h/1d buckets are compacted at once.
+    """
+    return bucket_start(now - timedelta(hours=RAW_TICK_RETENTION_HOURS), "1d")
+
+
+# ============================================================
+# Compaction + Pruning
+# ============================================================
+async def compact_and_prune(now: datetime = None) -> int:
+    """Roll expired raw ticks into candles, then delete them in bounded batches."""
+    cutoff = retention_cutoff(now or datetime.utcnow())
+    async with SessionLocal() as session:
+        oldest = (await session.execute(
+            select(func.min(TeamMarketInformation.timestamp))
+            .where(TeamMarketInformation.timestamp < cutoff)
+        )).scalar()
+    if oldest is None:
+        return 0
+
+    started = time.perf_counter()
+    # Rebuild candles for the expiring range from raw before any of it is deleted
+    await backfill_candles(start=oldest, end=cutoff)
+
+    deleted = 0
+    while True:
+        # Short transaction per batch so the live updater's inserts never wait long
+        async with SessionLocal() as session:
+            ids = (await session.execute(
+                select(TeamMarketInformation.id)
+                .where(TeamMarketInformation.timestamp < cutoff)
+                .limit(RETENTION_BATCH_SIZE)
+            )).scalars().all()
+            if not ids:
+                break
+            await session.execute(delete(TeamMarketInformation).where(TeamMarketInformation.id.in_(ids)))
+            await session.commit()
+        deleted += len(ids)
+        await asyncio.sleep(RETENTION_BATCH_PAUSE_SECONDS)
+
+    elapsed = time.perf_counter() - started
+    print(f"🧹 Compacted and pruned {deleted} raw ticks older than {cutoff:%Y-%m-%d %H:%M} in {elapsed:.1f}s")
+    return deleted
+
+
+async def retention_loop():
+    """Periodically enforce the raw-tick retention window."""
+    if RAW_TICK_RETENTION_HOURS <= 0:
+        print("⏸️ Raw tick retention disabled")
+        return
+    print(f"🗄️ Keeping raw ticks for {RAW_TICK_RETENTION_HOURS:g}h, older data compacted into candles")
+    while True:
+        try:
+            await compact_and_prune()
+        except Exception as exc:  # keep the loop alive; the next run retries
+            print(f"⚠️ Retention run failed: {exc!r}")
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(compact_and_prune())
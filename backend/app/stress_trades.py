@@ -0,0 +1,225 @@
+# stress_trades.py
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import random
+import secrets
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import OperationalError
+from app import execution
+from app.database import SessionLocal, DATABASE_URL
+from app.models import User, Trades, UserPosition
+from app.price_book import price_book
+from app.baskets import basket_registry
+from app.execution import execute_legs, TradeRejected
+from app.positions import replay_trades
+from app.money import to_cents, format_cents
+
+STRESS_TEAMS = ["Dallas", "Houston", "Kansas City", "Buffalo", "NFL"]
+MAX_ATTEMPTS = 20
+# SQLite "database is locked", MySQL lock wait timeout (1205) and deadlock (1213)
+RETRYABLE_ERRORS = ("database is locked", "deadlock", "lock wait timeout")
+
+
+# ============================================================
+# Load Generation
+# ============================================================
+def make_orders(user_ids: list, per_user: int, seed: int) -> list:
+    """Random buy/sell orders; roughly a third are sells, some of which must be rejected."""
+    rng = random.Random(seed)
+    orders = [
+        (user_id, {"team_name": rng.choice(STRESS_TEAMS),
+                   "action": "sell" if rng.random() < 0.35 else "buy",
+                   "quantity": rng.randint(1, 5)})
+        for user_id in user_ids for _ in range(per_user)
+    ]
+    rng.shuffle(orders)
+    return orders
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Lock contention the database resolved by aborting us; the order can simply run again."""
+    return isinstance(exc, OperationalError) and any(text in str(exc).lower() for text in RETRYABLE_ERRORS)
+
+
+async def fire(orders: list, concurrency: int) -> dict:
+    """Execute every order in its own session, ``concurrency`` at a time.
+
+    Busy/deadlock aborts are retried with backoff (they wrote nothing), so
+    only real failures end up in ``errors``.
+    """
+    gate = asyncio.Semaphore(concurrency)
+    counts = {"filled": 0, "rejected": 0, "retries": 0, "errors": 0}
+
+    async def one(user_id, leg):
+        async with gate:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                async with SessionLocal() as session:
+                    try:
+                        await execute_legs(session, user_id, [leg])
+                        counts["filled"] += 1
+                    except TradeRejected:
+                        counts["rejected"] += 1
+                    except Exception as exc:
+                        await session.rollback()
+                        if is_retryable(exc) and attempt < MAX_ATTEMPTS:
+                            counts["retries"] += 1
+                            await asyncio.sleep(random.uniform(0, 0.005 * attempt))
+                            continue
+                        counts["errors"] += 1
+                        print(f"⚠️ order failed: {exc!r}")
+                return
+
+    await asyncio.gather(*(one(user_id, leg) for user_id, leg in orders))
+    return counts
+
+
+def bypass_user_locks():
+    """Drop the in-process per-user lock so only the database row lock serialises orders."""
+    execution.user_lock = lambda user_id: contextlib.nullcontext()
+
+
+async def _warm_and_fire(orders: list, concurrency: int, no_user_lock: bool) -> dict:
+    if no_user_lock:
+        bypass_user_locks()
+    async with SessionLocal() as session:
+        await basket_registry.load(session)
+        await price_book.warm(session)
+    return await fire(orders, concurrency)
+
+
+def _fire_in_process(orders: list, concurrency: int, no_user_lock: bool) -> dict:
+    """Child-process entrypoint: its own engine, price book and (never shared) asyncio locks."""
+    return asyncio.run(_warm_and_fire(orders, concurrency, no_user_lock))
+
+
+def fire_processes(orders: list, concurrency: int, processes: int, no_user_lock: bool) -> dict:
+    """Split the orders across ``processes`` workers so one user's orders race across processes.
+
+    Each process has its own per-user asyncio locks, so only the
+    SELECT ... FOR UPDATE row lock keeps a user's balance consistent.
+    """
+    slices = [orders[i::processes] for i in range(processes)]
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = pool.map(_fire_in_process, slices, [concurrency] * processes, [no_user_lock] * processes)
+        return dict(sum((Counter(r) for r in results), Counter()))
+
+
+# ============================================================
+# Invariant Checks
+# ============================================================
+async def check(user_ids: list) -> int:
+    """Balances and positions must equal an exact replay of the Trades ledger."""
+    failures = 0
+    async with SessionLocal() as session:
+        users = {u.id: u for u in (await session.execute(select(User).where(User.id.in_(user_ids)))).scalars()}
+        trades = (await session.execute(
+            select(Trades).where(Trades.user_id.in_(user_ids)).order_by(Trades.id.asc())
+        )).scalars().all()
+        stored = {
+            (p.user_id, p.team_name): p.quantity
+            for p in (await session.execute(
+                select(UserPosition).where(UserPosition.user_id.in_(user_ids))
+            )).scalars()
+        }
+
+    running = {user_id: users[user_id].initial_deposit_cents for user_id in user_ids}
+    for t in trades:
+        amount = t.price_cents * t.quantity
+        running[t.user_id] += amount if t.action == "sell" else -amount
+        if running[t.user_id] < 0:
+            failures += 1
+            print(f"❌ user {t.user_id} went negative at trade {t.id}")
+        # Each trade must start from the previous one's balance; a lost update breaks the chain
+        if running[t.user_id] != t.balance_after_trade_cents:
+            failures += 1
+            print(f"❌ user {t.user_id} trade {t.id}: balance_after_trade {format_cents(t.balance_after_trade_cents)} "
+                  f"!= ledger {format_cents(running[t.user_id])}")
+            running[t.user_id] = t.balance_after_trade_cents
+
+    for user_id, expected in running.items():
+        if users[user_id].balance_cents != expected:
+            failures += 1
+            print(f"❌ user {user_id}: balance {format_cents(users[user_id].balance_cents)} "
+                  f"!= ledger {format_cents(expected)}")
+
+    replayed = {key: v[0] for key, v in replay_trades(trades).items()}
+    for key in replayed.keys() | stored.keys():
+        if replayed.get(key, 0) != stored.get(key, 0):
+            failures += 1
+            print(f"❌ position {key}: stored {stored.get(key, 0)} != ledger {replayed.get(key, 0)}")
+        if replayed.get(key, 0) < 0:
+            failures += 1
+            print(f"❌ position {key} is negative")
+    return failures
+
+
+# ============================================================
+# Entrypoint
+# ============================================================
+async def run(users: int, per_user: int, concurrency: int, balance: float, seed: int, keep: bool,
+              processes: int = 1, no_user_lock: bool = False) -> int:
+    if (processes > 1 or no_user_lock) and DATABASE_URL.startswith("sqlite"):
+        print("⚠️ SQLite ignores FOR UPDATE, so lost updates are expected in this mode; "
+              "run against MySQL to prove the row lock")
+    if no_user_lock:
+        bypass_user_locks()
+    async with SessionLocal() as session:
+        await basket_registry.load(session)
+        await price_book.warm(session)
+        tag = secrets.token_hex(3)
+        await session.execute(insert(User), [
+            {"email": f"stress-{tag}-{i}@example.com", "password": "!",
+             "balance_cents": to_cents(balance), "initial_deposit_cents": to_cents(balance)}
+            for i in range(users)
+        ])
+        await session.commit()
+        user_ids = (await session.execute(
+            select(User.id).where(User.email.like(f"stress-{tag}-%"))
+        )).scalars().all()
+
+    orders = make_orders(user_ids, per_user, seed)
+    started = time.perf_counter()
+    if processes > 1:
+        counts = await asyncio.get_running_loop().run_in_executor(
+            None, fire_processes, orders, concurrency, processes, no_user_lock
+        )
+    else:
+        counts = await fire(orders, concurrency)
+    elapsed = time.perf_counter() - started
+    print(f"🚀 {len(orders)} orders for {users} users across {processes} process(es) in {elapsed:.2f}s "
+          f"({len(orders) / elapsed:.0f}/s): {counts}")
+
+    failures = await check(user_ids) + counts["errors"]
+    print("✅ balances and positions exact" if not failures else f"❌ {failures} invariant violations")
+
+    if not keep:
+        async with SessionLocal() as session:
+            for model in (Trades, UserPosition):
+                await session.execute(delete(model).where(model.user_id.in_(user_ids)))
+            await session.execute(delete(User).where(User.id.in_(user_ids)))
+            await session.commit()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fire concurrent orders and verify balances/positions stay exact.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--orders-per-user", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--balance", type=float, default=100000.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the generated users and trades")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Fire from this many processes so a user's orders race across workers")
+    parser.add_argument("--no-user-lock", action="store_true",
+                        help="Bypass the in-process per-user lock; only the row lock serialises orders")
+    args = parser.parse_args()
+    failed = asyncio.run(run(args.users, args.orders_per_user, args.concurrency, args.balance, args.seed, args.keep,
+                             args.processes, args.no_user_lock))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,198 @@
+import abc
+import asyncio
+import base64
+import hashlib
+import heapq
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from app.database import SessionLocal
+from app.models import SessionToken
+
+# ============================================================
+# Token Store Config
+# ============================================================
+# "memory" (single worker), "db" (shared table) or "signed" (stateless HMAC)
+TOKEN_STORE = os.getenv("TOKEN_STORE", "memory")
+TOKEN_SECRET = os.getenv("TOKEN_SECRET")  # required for "signed"; share it across workers
+TOKEN_LIFETIME = timedelta(hours=float(os.getenv("TOKEN_LIFETIME_HOURS", str(7 * 24))))
+TOKEN_SWEEP_SECONDS = float(os.getenv("TOKEN_SWEEP_SECONDS", "300"))
+
+
+class TokenInvalid(Exception):
+    """The token is unknown, malformed or expired; ``str(exc)`` is the client-facing reason."""
+
+
+# ============================================================
+# Backends
+# ============================================================
+class TokenStore(abc.ABC):
+    """Issues session tokens and resolves them back to a user id."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def issue(self, user_id: int) -> str:
+        """Create a token for ``user_id``."""
+
+    @abc.abstractmethod
+    async def resolve(self, token: str) -> int:
+        """Return the token's user id or raise TokenInvalid."""
+
+    async def sweep(self, now: datetime = None) -> int:
+        """Drop expired tokens; returns how many were removed."""
+        return 0
+
+    async def sweep_loop(self):
+        """Periodically evict expired tokens so the store stays bounded."""
+        while True:
+            await asyncio.sleep(TOKEN_SWEEP_SECONDS)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    print(f"🧹 Swept {removed} expired session tokens")
+            except Exception as exc:  # keep the loop alive; the next run retries
+                print(f"⚠️ Token sweep failed: {exc!r}")
+
+
+class MemoryTokenStore(TokenStore):
+    """Process-local dict; only valid with a single worker.
+
+    Expiry times are also kept in a min-heap so each sweep pops only the
+    tokens that expired, instead of scanning every live session.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._tokens = {}
+        self._expiry = []
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    async def issue(self, user_id: int) -> str:
+        token = secrets.token_hex(32)
+        expires_at = datetime.utcnow() + TOKEN_LIFETIME
+        self._tokens[token] = (user_id, expires_at)
+        heapq.heappush(self._expiry, (expires_at, token))
+        return token
+
+    async def resolve(self, token: str) -> int:
+        data = self._tokens.get(token)
+        if not data:
+            raise TokenInvalid("Invalid or expired token")
+        user_id, expires_at = data
+        if datetime.utcnow() > expires_at:
+            del self._tokens[token]
+            raise TokenInvalid("Session expired")
+        return user_id
+
+    async def sweep(self, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        removed = 0
+        while self._expiry and self._expiry[0][0] < now:
+            _, token = heapq.heappop(self._expiry)
+            if self._tokens.pop(token, None) is not None:
+                removed += 1
+        return removed
+
+
+class DatabaseTokenStore(TokenStore):
+    """Tokens in the shared ``session_token`` table, so every worker sees every session.
+
+    Only a SHA-256 of each token is stored; a leaked table cannot be replayed.
+    """
+
+    name = "db"
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def issue(self, user_id: int) -> str:
+        token = secrets.token_hex(32)
+        async with SessionLocal() as session:
+            session.add(SessionToken(token_hash=self._digest(token), user_id=user_id,
+                                     expires_at=datetime.utcnow() + TOKEN_LIFETIME))
+            await session.commit()
+        return token
+
+    async def resolve(self, token: str) -> int:
+        async with SessionLocal() as session:
+            row = (await session.execute(
+                select(SessionToken.user_id, SessionToken.expires_at)
+                .where(SessionToken.token_hash == self._digest(token))
+            )).first()
+            if row is None:
+                raise TokenInvalid("Invalid or expired token")
+            if datetime.utcnow() > row.expires_at:
+                await session.execute(delete(SessionToken).where(SessionToken.token_hash == self._digest(token)))
+                await session.commit()
+                raise TokenInvalid("Session expired")
+        return row.user_id
+
+    async def sweep(self, now: datetime = None) -> int:
+        async with SessionLocal() as session:
+            res = await session.execute(delete(SessionToken).where(SessionToken.expires_at < (now or datetime.utcnow())))
+            await session.commit()
+        return res.rowcount
+
+
+class SignedTokenStore(TokenStore):
+    """Stateless tokens: ``<user_id>.<expiry>.<HMAC-SHA256 signature>``, verified without any lookup.
+
+    Any worker holding ``TOKEN_SECRET`` can validate them. Tokens cannot be
+    revoked before they expire; rotating the secret invalidates all of them.
+    """
+
+    name = "signed"
+
+    def __init__(self, secret: str = None):
+        secret = secret or TOKEN_SECRET
+        if not secret:
+            raise ValueError("TOKEN_SECRET must be set to use TOKEN_STORE=signed")
+        self._key = secret.encode()
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._key, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    async def issue(self, user_id: int) -> str:
+        expires = int((datetime.utcnow() + TOKEN_LIFETIME - datetime(1970, 1, 1)).total_seconds())
+        payload = f"{user_id}.{expires}"
+        return f"{payload}.{self._sign(payload)}"
+
+    async def resolve(self, token: str) -> int:
+        payload, _, signature = token.rpartition(".")
+        user_id, _, expires = payload.partition(".")
+        valid = hmac.compare_digest(signature.encode(), self._sign(payload).encode())
+        if not (valid and user_id.isdigit() and expires.isdigit()):
+            raise TokenInvalid("Invalid or expired token")
+        if datetime.utcnow() > datetime(1970, 1, 1) + timedelta(seconds=int(expires)):
+            raise TokenInvalid("Session expired")
+        return int(user_id)
+
+    async def sweep_loop(self):
+        return  # nothing is stored
+
+
+TOKEN_STORES = {
+    MemoryTokenStore.name: MemoryTokenStore,
+    DatabaseTokenStore.name: DatabaseTokenStore,
+    SignedTokenStore.name: SignedTokenStore,
+}
+
+
+def make_token_store(name: str) -> TokenStore:
+    """Build a registered token store by name (``memory``, ``db`` or ``signed``)."""
+    try:
+        store_cls = TOKEN_STORES[name]
+    except KeyError:
+        raise ValueError(f"Unknown token store '{name}' (choose from {sorted(TOKEN_STORES)})")
+    return store_cls()
+
+
+token_store = make_token_store(TOKEN_STORE)
@@ -0,0 +1,130 @@
+import os
+import time
+import numpy as np
+from sqlalchemy import select, insert
+from app.models import User, UserPosition, PortfolioHistory
+
+# Full reload interval, picking up trades executed by other workers
+VALUATION_RESYNC_SECONDS = float(os.getenv("VALUATION_RESYNC_SECONDS", "300"))
+
+
+# ============================================================
+# Portfolio Valuation Engine (users x instruments sparse matrix)
+# ============================================================
+class PortfolioValuationEngine:
+    """Value every portfolio with one sparse matrix-vector product per tick.
+
+    Holdings are a users x instruments matrix kept in COO form (row, col,
+    quantity) alongside a cash vector. Trades update single cells in place;
+    the flat arrays are rebuilt only when holdings changed, so a tick costs
+    O(positions) numpy work and one bulk insert regardless of user count.
+    Cash, prices and values are int64 cents, so sums are exact.
+    """
+
+    def __init__(self):
+        self._user_rows = {}
+        self._user_ids = []
+        self._cash = np.zeros(0, dtype=np.int64)
+        self._instrument_cols = {}
+        self._instruments = []
+        self._holdings = {}
+        self._user_holdings = {}
+        self._arrays = None
+        self.loaded_at = None
+
+    def __len__(self) -> int:
+        return len(self._user_ids)
+
+    @property
+    def user_ids(self) -> list:
+        """User ids in row order (aligned with ``values``)."""
+        return self._user_ids
+
+    def _row(self, user_id: int) -> int:
+        row = self._user_rows.get(user_id)
+        if row is None:
+            row = self._user_rows[user_id] = len(self._user_ids)
+            self._user_ids.append(user_id)
+            self._cash = np.append(self._cash, np.int64(0))
+        return row
+
+    def _col(self, name: str) -> int:
+        col = self._instrument_cols.get(name)
+        if col is None:
+            col = self._instrument_cols[name] = len(self._instruments)
+            self._instruments.append(name)
+        return col
+
+    def set_cash(self, user_id: int, balance_cents: int):
+        row = self._row(user_id)
+        self._cash[row] = balance_cents
+
+    def set_holding(self, user_id: int, team_name: str, quantity: int, balance_cents: int):
+        """Record a user's new quantity and cash (cents) after a trade."""
+        key = (self._row(user_id), self._col(team_name))
+        if quantity > 0:
+            self._holdings[key] = quantity
+            self._user_holdings.setdefault(key[0], {})[key[1]] = quantity
+        else:
+            self._holdings.pop(key, None)
+            self._user_holdings.get(key[0], {}).pop(key[1], None)
+        self._cash[key[0]] = balance_cents
+        self._arrays = None
+
+    async def load(self, session):
+        """(Re)build the matrix from users and open positions in two queries."""
+        self.__init__()
+        for user_id, balance_cents in (await session.execute(select(User.id, User.balance_cents))).all():
+            self.set_cash(user_id, balance_cents or 0)
+        res = await session.execute(
+            select(UserPosition.user_id, UserPosition.team_name, UserPosition.quantity)
+            .where(UserPosition.quantity > 0)
+        )
+        for user_id, team, qty in res.all():
+            row, col = self._row(user_id), self._col(team)
+            self._holdings[(row, col)] = qty
+            self._user_holdings.setdefault(row, {})[col] = qty
+        self.loaded_at = time.monotonic()
+
+    def needs_resync(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= VALUATION_RESYNC_SECONDS
+
+    def _coo(self):
+        if self._arrays is None:
+            n = len(self._holdings)
+            rows = np.fromiter((r for r, _ in self._holdings), dtype=np.intp, count=n)
+            cols = np.fromiter((c for _, c in self._holdings), dtype=np.intp, count=n)
+            qty = np.fromiter(self._holdings.values(), dtype=np.int64, count=n)
+            self._arrays = (rows, cols, qty)
+        return self._arrays
+
+    def values(self, prices: dict) -> np.ndarray:
+        """Total account value per user in cents (cash + holdings at ``prices``), row-aligned."""
+        rows, cols, qty = self._coo()
+        price_vector = np.array([prices.get(name, 0) for name in self._instruments], dtype=np.int64)
+        values = self._cash.copy()
+        np.add.at(values, rows, qty * price_vector[cols])
+        return values
+
+    def value_of(self, user_id: int, prices: dict):
+        """One user's account value in cents at ``prices``, or None if the user is not loaded."""
+        row = self._user_rows.get(user_id)
+        if row is None:
+            return None
+        holdings = self._user_holdings.get(row, {})
+        return int(self._cash[row]) + sum(qty * prices.get(self._instruments[col], 0)
+                                          for col, qty in holdings.items())
+
+    async def record(self, session, prices: dict, timestamp) -> np.ndarray:
+        """Append one PortfolioHistory row per user with a single bulk insert; returns the values."""
+        values = self.values(prices)
+        if not self._user_ids:
+            return values
+        await session.execute(insert(PortfolioHistory), [
+            {"user_id": user_id, "balance_cents": balance_cents, "timestamp": timestamp}
+            for user_id, balance_cents in zip(self._user_ids, values.tolist())
+        ])
+        return values
+
+
+valuation_engine = PortfolioValuationEngine()
@@ -1,14 +1,70 @@
+import { useEffect, useState } from "react";
 import { useQuery, useMutation } from "@tanstack/react-query";
-import { executeTrade, fetchPortfolio } from "@/lib/api";
+import {
+  executeTrade,
+  fetchPortfolio,
+  subscribeMarketStream,
+  PortfolioResponse,
+  TeamMarketInformation,
+} from "@/lib/api";
 import { queryClient } from "@/lib/queryClient";
 
+const toCents = (amount: string | number) => Math.round(Number(amount) * 100);
+const formatCents = (cents: number) => (cents / 100).toFixed(2);
+
+/**
+ * Re-price held positions from a pushed price vector; quantities and cost basis are unchanged.
+ */
+const markToMarket = (
+  portfolio: PortfolioResponse,
+  teams: TeamMarketInformation[],
+): PortfolioResponse => {
+  const prices = new Map(teams.map((team) => [team.team_name, toCents(team.price)]));
+  let totalValue = 0;
+  let totalUnrealized = 0;
+  const positions = portfolio.positions.map((position) => {
+    const price = prices.get(position.team_name) ?? toCents(position.current_price);
+    const value = price * position.quantity;
+    const unrealized = value - toCents(position.cost_basis);
+    totalValue += value;
+    totalUnrealized += unrealized;
+    return {
+      ...position,
+      current_price: formatCents(price),
+      position_value: formatCents(value),
+      unrealized_pnl: formatCents(unrealized),
+    };
+  });
+  return {
+    ...portfolio,
+    positions,
+    total_value: formatCents(totalValue),
+    total_unrealized_pnl: formatCents(totalUnrealized),
+  };
+};
+
 export function usePortfolio() {
+  const [isStreaming, setIsStreaming] = useState(false);
+
+  useEffect(() => {
+    const unsubscribe = subscribeMarketStream(
+      (teams) =>
+        queryClient.setQueryData<PortfolioResponse>(["portfolio"], (portfolio) =>
+          portfolio ? markToMarket(portfolio, teams) : portfolio,
+        ),
+      setIsStreaming,
+    );
+    return () => unsubscribe?.();
+  }, []);
+
   return useQuery({
     queryKey: ["portfolio"],
     queryFn: fetchPortfolio,
-    refetchInterval: 5000,
-    refetchIntervalInBackground: true,
-    staleTime: 0,
+    // Marked to market from /market/stream and refetched after trades; the slow poll
+    // only picks up resting orders that filled server-side
+    refetchInterval: isStreaming ? 60000 : 5000,
+    refetchIntervalInBackground: !isStreaming,
+    staleTime: isStreaming ? 60000 : 0,
   });
 }
 
@@ -1,9 +1,10 @@
-import { useQuery } from "@tanstack/react-query";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import {
   authSession,
   fetchPortfolioHistory,
   fetchPortfolioHistoryRecomputed,
   fetchPortfolioCurrentBalance,
+  PORTFOLIO_HISTORY_MAX_POINTS,
   PortfolioLiveHistoryResponse,
   PortfolioRecomputedHistoryPoint,
 } from "@/lib/api";
@@ -39,6 +40,68 @@ const normalizeHistoryPoints = (points: HistoryLikePoint[]): NormalizedHistoryPo
         new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime(),
     );
 
+const pointTime = (point: NormalizedHistoryPoint) => new Date(point.timestamp).getTime();
+
+/**
+ * Reconcile against the live balance snapshot: append it when it is newer than the
+ * last history point and report it as the current account value.
+ */
+async function withCurrentBalance(
+  history: NormalizedHistoryPoint[],
+): Promise<{ history: NormalizedHistoryPoint[]; accountValue?: string }> {
+  try {
+    const current = await fetchPortfolioCurrentBalance();
+    if (current?.timestamp && current?.balance) {
+      const currentTs = new Date(current.timestamp).getTime();
+      if (Number.isFinite(currentTs)) {
+        const lastTs = history.length ? pointTime(history[history.length - 1]) : -Infinity;
+        if (!history.length || currentTs > lastTs) {
+          history.push({
+            timestamp: current.timestamp,
+            balance: current.balance,
+          });
+        }
+        return { history, accountValue: current.balance };
+      }
+    }
+  } catch {
+    // Ignore current snapshot errors and rely on whatever history we already collected.
+  }
+  return { history };
+}
+
+/**
+ * Steady-state poll: ask only for snapshots after the last cursor and append them,
+ * then reconcile with the current balance like a full load does.
+ * Appended points are full resolution, so once the series has grown past twice the
+ * downsampled size it is reloaded and re-thinned by the server instead.
+ */
+async function fetchPortfolioHistoryIncrement(
+  previous: PortfolioLiveHistoryResponse,
+): Promise<PortfolioLiveHistoryResponse> {
+  const live = await fetchPortfolioHistory(undefined, previous.cursor);
+  const appended = normalizeHistoryPoints(live.history ?? []);
+  // A previously appended current-balance point is superseded by the stored snapshots
+  const firstAppendedTs = appended.length ? pointTime(appended[0]) : Infinity;
+  const history = [
+    ...previous.history.filter((point) => pointTime(point) < firstAppendedTs),
+    ...appended,
+  ];
+  if (history.length > 2 * PORTFOLIO_HISTORY_MAX_POINTS) {
+    return fetchPortfolioHistoryWithVerification();
+  }
+  const reconciled = await withCurrentBalance(history);
+  return {
+    ...previous,
+    history: reconciled.history,
+    cursor: live.cursor ?? previous.cursor,
+    current_total_account_value:
+      reconciled.accountValue ??
+      reconciled.history.at(-1)?.balance ??
+      previous.current_total_account_value,
+  };
+}
+
 async function fetchPortfolioHistoryWithVerification(): Promise<PortfolioLiveHistoryResponse> {
   const live = await fetchPortfolioHistory();
   let normalized = normalizeHistoryPoints(live.history ?? []);
@@ -71,30 +134,15 @@ async function fetchPortfolioHistoryWithVerification(): Promise<PortfolioLiveHis
     }
   }
 
-  try {
-    const current = await fetchPortfolioCurrentBalance();
-    if (current?.timestamp && current?.balance) {
-      const currentTs = new Date(current.timestamp).getTime();
-      if (Number.isFinite(currentTs)) {
-        const lastTs = normalized.length
-          ? new Date(normalized[normalized.length - 1].timestamp).getTime()
-          : -Infinity;
-        if (!normalized.length || currentTs > lastTs) {
-          normalized.push({
-            timestamp: current.timestamp,
-            balance: current.balance,
-          });
-        }
-        derivedAccountValue = current.balance;
-      }
-    }
-  } catch {
-    // Ignore current snapshot errors and rely on whatever history we already collected.
+  const reconciled = await withCurrentBalance(normalized);
+  if (reconciled.accountValue) {
+    derivedAccountValue = reconciled.accountValue;
   }
 
   const response: PortfolioLiveHistoryResponse = {
     user_id: userId ?? 0,
     history: normalized,
+    cursor: live.history?.length ? live.cursor : null,
   };
 
   if (derivedInitialDeposit) {
@@ -116,10 +164,17 @@ async function fetchPortfolioHistoryWithVerification(): Promise<PortfolioLiveHis
 
 export function usePortfolioValueHistory() {
   const token = authSession.getToken();
+  const queryClient = useQueryClient();
+  const queryKey = ["portfolio-value-history", token];
 
   return useQuery<PortfolioLiveHistoryResponse>({
-    queryKey: ["portfolio-value-history", token],
-    queryFn: fetchPortfolioHistoryWithVerification,
+    queryKey,
+    queryFn: () => {
+      const previous = queryClient.getQueryData<PortfolioLiveHistoryResponse>(queryKey);
+      return previous?.cursor
+        ? fetchPortfolioHistoryIncrement(previous)
+        : fetchPortfolioHistoryWithVerification();
+    },
     enabled: !!token,
     refetchInterval: 5000,
     refetchIntervalInBackground: true,
@@ -1,12 +1,25 @@
+import { useEffect, useState } from "react";
 import { useQuery } from "@tanstack/react-query";
-import { fetchTeams } from "@/lib/api";
+import { fetchTeams, subscribeMarketStream } from "@/lib/api";
+import { queryClient } from "@/lib/queryClient";
 
 export function useTeams() {
+  const [isStreaming, setIsStreaming] = useState(false);
+
+  useEffect(() => {
+    const unsubscribe = subscribeMarketStream(
+      (teams) => queryClient.setQueryData(["all-teams"], teams),
+      setIsStreaming,
+    );
+    return () => unsubscribe?.();
+  }, []);
+
   return useQuery({
     queryKey: ["all-teams"],
     queryFn: fetchTeams,
-    refetchInterval: 5000,
-    refetchIntervalInBackground: true,
-    staleTime: 0,
+    // Prices are pushed over /market/stream; poll only while it is down
+    refetchInterval: isStreaming ? false : 5000,
+    refetchIntervalInBackground: !isStreaming,
+    staleTime: isStreaming ? Infinity : 0,
   });
 }
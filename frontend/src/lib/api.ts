@@ -184,11 +184,80 @@ export async function fetchTeams() {
   return normalizeInstrumentList(response, "team");
 }
 
+type MarketStreamListener = (teams: TeamMarketInformation[]) => void;
+
+const marketStreamListeners = new Set<MarketStreamListener>();
+let marketStream: EventSource | null = null;
+
+/**
+ * Subscribe to the server-pushed price feed (`/market/stream`).
+ * One EventSource is shared by every subscriber in the tab.
+ * Returns an unsubscribe function, or null when EventSource is unavailable.
+ */
+export function subscribeMarketStream(
+  listener: MarketStreamListener,
+  onStatus?: (open: boolean) => void,
+) {
+  if (!isBrowser || typeof EventSource === "undefined") return null;
+
+  marketStreamListeners.add(listener);
+  if (!marketStream) {
+    marketStream = new EventSource(buildUrl("/market/stream"));
+    marketStream.onmessage = (event) => {
+      let payload: TeamListApiResponse;
+      try {
+        payload = JSON.parse(event.data);
+      } catch {
+        return;
+      }
+      const teams = normalizeInstrumentList(payload, "team");
+      marketStreamListeners.forEach((notify) => notify(teams));
+    };
+  }
+
+  const source = marketStream;
+  const handleOpen = () => onStatus?.(true);
+  const handleError = () => onStatus?.(source.readyState === EventSource.OPEN);
+  source.addEventListener("open", handleOpen);
+  source.addEventListener("error", handleError);
+  if (source.readyState === EventSource.OPEN) onStatus?.(true);
+
+  return () => {
+    source.removeEventListener("open", handleOpen);
+    source.removeEventListener("error", handleError);
+    marketStreamListeners.delete(listener);
+    if (marketStreamListeners.size === 0 && marketStream) {
+      marketStream.close();
+      marketStream = null;
+    }
+  };
+}
+
 export async function fetchTeamHistory(teamName: string) {
   const response = await request<TeamListApiResponse>(`/market/team/${encodeURIComponent(teamName)}`);
   return normalizeInstrumentList(response, "team");
 }
 
+export interface MarketHistoryResponse {
+  interval: string;
+  timestamps: string[];
+  series: Record<string, Array<number | null>>;
+}
+
+/**
+ * History for many instruments in one request, on a shared time axis.
+ */
+export async function fetchMarketHistory(
+  teamNames: string[],
+  options: { interval?: string; start?: string; end?: string } = {},
+) {
+  const params = new URLSearchParams({ teams: teamNames.join(",") });
+  if (options.interval) params.set("interval", options.interval);
+  if (options.start) params.set("start", options.start);
+  if (options.end) params.set("end", options.end);
+  return request<MarketHistoryResponse>(`/market/history?${params.toString()}`);
+}
+
 
 export interface AuthResponse {
   success: boolean;
@@ -316,6 +385,7 @@ export interface PortfolioLiveHistoryPoint {
 export interface PortfolioLiveHistoryResponse {
   user_id: number;
   history: PortfolioLiveHistoryPoint[];
+  cursor?: string | null;
   initial_deposit?: string;
   current_cash_balance?: string;
   current_total_account_value?: string;
@@ -341,8 +411,13 @@ export interface PortfolioCurrentBalance {
   message?: string;
 }
 
-export function fetchPortfolioHistory() {
-  return request<PortfolioLiveHistoryResponse>("/trades/portfolio/history");
+// Charts never need more points than they have pixels; the server thins the series (LTTB)
+export const PORTFOLIO_HISTORY_MAX_POINTS = 500;
+
+export function fetchPortfolioHistory(maxPoints = PORTFOLIO_HISTORY_MAX_POINTS, since?: string | null) {
+  const params = new URLSearchParams({ max_points: String(maxPoints) });
+  if (since) params.set("since", since);
+  return request<PortfolioLiveHistoryResponse>(`/trades/portfolio/history?${params.toString()}`);
 }
 
 export function fetchPortfolioCurrentBalance() {
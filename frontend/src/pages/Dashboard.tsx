@@ -10,7 +10,7 @@ import { useMarketNavigation } from "@/hooks/useMarketNavigation";
 import { Skeleton } from "@/components/ui/skeleton";
 import { getTeamAbbreviation } from "@/lib/utils";
 import type { TeamMarketInformation } from "@/lib/api";
-import { fetchTeamHistory } from "@/lib/api";
+import { fetchMarketHistory } from "@/lib/api";
 import { usePortfolio } from "@/hooks/usePortfolio";
 import { buildPortfolioSnapshot } from "@/lib/portfolio-utils";
 import { usePortfolioValueHistory } from "@/hooks/usePortfolioValueHistory";
@@ -31,36 +31,21 @@ const normalizeTimestamp = (timestamp?: string) => {
   return Number.isFinite(time) ? time : NaN;
 };
 
-const pickWeekReferencePrice = (history: TeamMarketInformation[]): number | null => {
-  if (!history.length) return null;
-  const enriched = history
-    .map((entry, index) => ({
-      ...entry,
-      timestampValue: normalizeTimestamp(entry.timestamp) || index,
-    }))
-    .sort((a, b) => a.timestampValue - b.timestampValue);
-
-  const latest = enriched[enriched.length - 1];
-  const latestPrice = priceUSD(latest.value ?? latest.price);
-  const latestTs = latest.timestampValue || Date.now();
-  const threshold = latestTs - WEEK_MS;
+/**
+ * Last price at or before one week ago, falling back to the oldest point.
+ */
+const pickWeekReferencePrice = (
+  timestamps: number[],
+  values: Array<number | null>,
+): number | null => {
+  const points = timestamps
+    .map((timestampValue, index) => ({ timestampValue, price: priceUSD(values[index]) }))
+    .filter((point) => Number.isFinite(point.timestampValue) && point.price);
+  if (!points.length) return null;
+  const threshold = points[points.length - 1].timestampValue - WEEK_MS;
   const reference =
-    [...enriched]
-      .reverse()
-      .find((entry) => entry.timestampValue <= threshold) ?? enriched[0];
-  const refPrice = priceUSD(reference.value ?? reference.price);
-  if (!latestPrice || !refPrice || !Number.isFinite(refPrice) || refPrice === 0) {
-    return null;
-  }
-  return refPrice;
-};
-
-const chunkArray = <T,>(array: T[], size: number): T[][] => {
-  const chunks: T[][] = [];
-  for (let i = 0; i < array.length; i += size) {
-    chunks.push(array.slice(i, i + size));
-  }
-  return chunks;
+    [...points].reverse().find((point) => point.timestampValue <= threshold) ?? points[0];
+  return Number.isFinite(reference.price) ? reference.price : null;
 };
 
 type NormalizedTeam = {
@@ -102,29 +87,29 @@ export default function Dashboard() {
     let cancelled = false;
 
     const fetchReferences = async () => {
-      for (const chunk of chunkArray(missing, 6)) {
-        chunk.forEach((name) => pendingRefs.current.add(name));
-        const results = await Promise.allSettled(
-          chunk.map((name) => fetchTeamHistory(name)),
-        );
-        if (cancelled) {
-          chunk.forEach((name) => pendingRefs.current.delete(name));
-          return;
-        }
+      missing.forEach((name) => pendingRefs.current.add(name));
+      try {
+        // One request for every instrument instead of one per team
+        const history = await fetchMarketHistory(missing, {
+          interval: "1h",
+          start: new Date(Date.now() - WEEK_MS - 60 * 60 * 1000).toISOString().slice(0, 19),
+        });
+        if (cancelled) return;
+        const timestamps = history.timestamps.map(normalizeTimestamp);
         const updates: Record<string, number> = {};
-        results.forEach((result, index) => {
-          const teamName = chunk[index];
-          pendingRefs.current.delete(teamName);
-          if (result.status === "fulfilled") {
-            const referencePrice = pickWeekReferencePrice(result.value);
-            if (referencePrice !== null) {
-              updates[teamName] = referencePrice;
-            }
+        missing.forEach((teamName) => {
+          const referencePrice = pickWeekReferencePrice(timestamps, history.series[teamName] ?? []);
+          if (referencePrice !== null) {
+            updates[teamName] = referencePrice;
           }
         });
         if (Object.keys(updates).length) {
           setReferencePrices((prev) => ({ ...prev, ...updates }));
         }
+      } catch {
+        // Leave references unset; the change column shows 0% until the next attempt
+      } finally {
+        missing.forEach((name) => pendingRefs.current.delete(name));
       }
     };
 